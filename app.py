@@ -1,9 +1,15 @@
 import streamlit as st
 import os
-import re
-import asyncio
+import time
+import datetime
 from dotenv import load_dotenv
-from utils import extract_video_id, get_transcript, generate_social_media_post, get_available_models, format_transcript
+from utils import (get_available_models, get_cache_stats, get_coalescing_stats, get_hedging_stats, get_saved_outputs, get_transcript, parse_video_id, preload_dependencies,
+                   search_saved_outputs)
+from routing import AUTO_MODEL
+from jobs import job_manager
+from prefetch import TranscriptPrefetcher
+from metrics import Trace, record_span, span, tracing
+from sections import SECTION_TITLES, parse_sections
 
 # Load API Key uncomment to use locally
 load_dotenv()
@@ -19,6 +25,9 @@ gemini_api_key = st.session_state.gemini_api_key
 # Set page config
 st.set_page_config(page_title="🎥 Tutorial Generator", page_icon="💡", layout="wide")
 
+# Load the Gemini SDK and transcript API while the user fills in the form
+preload_dependencies()
+
 # Inject custom CSS
 st.markdown("""
     <style>
@@ -107,7 +116,12 @@ if not gemini_api_key:
 
 # Model Selection
 available_models = get_available_models()
-model_name = st.selectbox("Choose a Gemini Model", available_models or ["gemini-2.5-flash"])
+model_name = st.selectbox(
+    "Choose a Gemini Model",
+    [AUTO_MODEL] + (available_models or ["gemini-2.5-flash"]),
+    format_func=lambda model: "Auto (best model per format)" if model == AUTO_MODEL else model,
+    help="Auto picks a model per format from the transcript length and recent latency; choose a model to use it for everything.",
+)
 
 # Input Form
 st.markdown("### Input Video & Query")
@@ -116,6 +130,15 @@ with st.container():
     with col1:
         video_id = st.text_input("🎬 YouTube Video ID or URL", placeholder="e.g., OZ5OZZZ2cvk")
         st.caption("Paste the full URL or just the video ID (after `v=` in the link).")
+        # Start fetching the transcript while the user picks formats and writes a query
+        if "transcript_prefetcher" not in st.session_state:
+            st.session_state.transcript_prefetcher = TranscriptPrefetcher(get_transcript)
+        prefetcher = st.session_state.transcript_prefetcher
+        entered_video_id = parse_video_id(video_id) if video_id else None
+        if entered_video_id:
+            prefetcher.prefetch(entered_video_id)
+            if prefetcher.ready(entered_video_id):
+                st.caption("✅ Transcript loaded")
     with col2:
         query = st.text_area("💬 Your Query", placeholder="e.g., Generate a tutorial from this content", height=100)
 
@@ -129,39 +152,149 @@ with col2:
 with col3:
     note_taking = st.checkbox("Generate Notes", value=False)
 
+regenerate = st.checkbox("🔄 Regenerate (ignore cached results)", value=False, help="Draw a fresh sample from Gemini instead of reusing an identical earlier generation.")
+show_debug = st.sidebar.checkbox("🐞 Show timing breakdown", value=False)
+
+# Full-text search over everything generated before, so nothing has to be regenerated to look it up
+search_text = st.sidebar.text_input("🔎 Search past outputs", placeholder="e.g., docker compose")
+if search_text.strip():
+    matches = search_saved_outputs(search_text)
+    if not matches:
+        st.sidebar.caption("No past outputs match.")
+    for match in matches:
+        saved_on = datetime.datetime.fromtimestamp(match.created_at).strftime("%Y-%m-%d")
+        st.sidebar.markdown(f"**{match.format}** · `{match.video_id}` · {saved_on}\n\n{match.snippet}")
+
 # Generate Button
 generate_clicked = st.button(" Generate Content", type="primary", disabled=not video_id)
 
-# Core function
-async def run_agent(video_id, query, platforms, api_key):
-    with st.spinner(" Fetching video ..."):
-        try:
-            transcript = get_transcript(video_id)
-            st.success("Video fetched successfully!")
-            if not transcript:
-                return None, "No video found"
-            transcript_text = format_transcript(transcript)
-        except Exception as e:
-            return None, str(e)
-
-    with st.spinner(f" Generating content using '{model_name}'..."):
-        try:
-            tasks = [generate_social_media_post(transcript, model_name, platform, api_key, query) for platform in platforms]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            posts = []
-            for platform, res in zip(platforms, results):
-                if isinstance(res, Exception):
-                    content = f"[Error generating for {platform}: {res}]"
-                else:
-                    content = res
-                posts.append({"platform": platform, "content": content})
-            return posts, None
-        except Exception as e:
-            return None, str(e)
+def render_post(platform, content, trace=None):
+    parse_started = time.perf_counter()
+    sections = parse_sections(platform, content)
+    final_post = sections.get("final_post", "")
+    summary = sections.get("summary", "")
+    takeaways = sections.get("takeaways", "")
+    notes_content = sections.get("notes", "")
+    blog = sections.get("blog", "")
+    # Pages rerun on every interaction, so keep only the latest parse of each format in the trace
+    record_span("post_parse", time.perf_counter() - parse_started, format=platform, trace=trace, replace=True)
+
+    with st.expander(f"📄 {platform} Output", expanded=True):
+        if platform.lower() == "tutorial blog":
+            st.markdown("#### 📝 Blog-style Tutorial")
+            st.markdown(blog, unsafe_allow_html=False)
+            st.download_button("📥 Download Blog Post", data=blog, file_name="tutorial_blog.md", mime="text/markdown", use_container_width=False)
+        elif platform.lower() == "summary":
+            st.markdown("### 📝 Summary")
+            st.markdown(summary, unsafe_allow_html=False)
+            st.markdown("### 🔑 Key Takeaways")
+            st.markdown(takeaways, unsafe_allow_html=False)
+            download_content = f"Summary:\n{summary}\n\nKey Takeaways:\n{takeaways}"
+            st.download_button(label="📥 Download Summary", data=download_content, file_name="content_hub_summary.md", mime="text/markdown")
+        elif platform.lower() == "note taking":
+            st.markdown("### 📝 Notes")
+            st.markdown(summary, unsafe_allow_html=False)
+            st.markdown("###  Main Notes")
+            st.markdown(notes_content, unsafe_allow_html=False)
+            download_content = f"Summary:\n{summary}\n\nMain Notes:\n{notes_content}"
+            st.download_button(label="📥 Download Notes", data=download_content, file_name="notes.md", mime="text/markdown")
+        else:
+            st.text_area("🪧 Final Post", final_post, height=100)
+            if summary:
+                st.markdown("**🧠 Summary**")
+                st.markdown(summary)
+            if blog:
+                st.markdown("**📘 Blog Insight**")
+                st.text_area("Blog", blog, height=200)
+
+            st.download_button(
+                label=f"📥 Download {platform} Content",
+                data=f"{final_post}\n\n{summary}\n\n{blog}",
+                file_name=f"{platform.lower()}_content.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
+
+JOB_STATUS_MESSAGES = {
+    "queued": " Waiting for a free worker ...",
+    "fetching": " Fetching video ...",
+    "generating": " Generating content ...",
+}
+
+def show_job_results(job):
+    if job.error:
+        st.error(f" Error: {job.error}")
+        return
+    if job.first_token is not None:
+        st.caption(f"⚡ First tokens after {job.first_token:.2f}s · finished in {job.total:.2f}s")
+    if job.model == AUTO_MODEL and job.models:
+        st.caption("🧭 " + " · ".join(f"{platform}: {model}" for platform, model in job.models.items()))
+    for platform in job.platforms:
+        if platform in job.results:
+            content = job.results[platform]
+        else:
+            content = f"[Error generating for {platform}: {job.errors.get(platform)}]"
+        render_post(platform, content, job.trace)
+
+def show_debug_panel(job):
+    if job.trace is None:
+        st.sidebar.caption("No timing data for this run (it was started before the server restarted).")
+        return
+    data = job.trace.to_dict()
+    st.sidebar.markdown("#### ⏱️ Stage timings")
+    st.sidebar.dataframe(
+        [{"stage": s["stage"], "format": s["format"], "model": s["model"], "ms": round(s["seconds"] * 1000, 1)} for s in data["spans"]],
+        hide_index=True,
+    )
+    if data["tokens"]:
+        st.sidebar.markdown("#### 🔢 Tokens")
+        st.sidebar.dataframe(data["tokens"], hide_index=True)
+    compression = data.get("compression")
+    if compression:
+        st.sidebar.caption(f"🗜️ Transcript compressed from ~{compression['input_tokens']:,} to ~{compression['output_tokens']:,} tokens "
+                           f"({compression['ratio']:.0%} of the original)")
+    caches = get_cache_stats()
+    transcripts, generations = caches["transcripts"], caches["generations"]
+    st.sidebar.caption(f"🗄️ Since startup: transcripts {transcripts['hits']} cached / {transcripts['misses']} fetched, "
+                       f"generations {generations['hits']} cached / {generations['misses']} generated "
+                       f"({generations['bytes'] / 2 ** 20:.1f} of {generations['max_bytes'] / 2 ** 20:.0f} MB on disk)")
+    coalescing = get_coalescing_stats()
+    if coalescing["transcripts"]["coalesced"] or coalescing["generations"]["coalesced"]:
+        st.sidebar.caption(f"🔗 Joined {coalescing['transcripts']['coalesced']} of {coalescing['transcripts']['calls']} transcript fetches and "
+                           f"{coalescing['generations']['coalesced']} of {coalescing['generations']['calls']} generations already in flight")
+    hedging = get_hedging_stats()
+    if hedging["hedges"]:
+        st.sidebar.caption(f"🏁 Hedged {hedging['hedges']} of {hedging['calls']} Gemini calls since startup "
+                           f"({hedging['hedge_wins']} answered first, ~{hedging['extra_input_tokens']:,} extra input tokens)")
+
+# Poll the running job without rerunning the whole page; a full rerun renders the final results
+@st.fragment(run_every=1.0)
+def watch_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    st.info(JOB_STATUS_MESSAGES.get(job.status, job.status))
+    for platform in job.platforms:
+        parser = job.sections.get(platform)
+        completed = dict(parser.completed) if parser else {}
+        if not completed:
+            # Raw output as tokens arrive, until the first section is complete
+            text = job.partial_text(platform)
+            if text:
+                st.markdown(f"**📄 {platform}** _(generating…)_\n\n" + text)
+            continue
+        st.markdown(f"**📄 {platform}** _(generating…)_")
+        for name, section in completed.items():
+            st.markdown(f"**{SECTION_TITLES[name]}**\n\n{section}")
+        current = parser.in_progress()
+        if current and current[0] not in completed and current[1].strip():
+            st.markdown(f"**{SECTION_TITLES[current[0]]}** _(generating…)_\n\n{current[1]}")
 
 # Process on click
 if generate_clicked:
-    processed_video_id = extract_video_id(video_id) or video_id
+    trace = Trace()
+    with tracing(trace), span("video_id_parse"):
+        processed_video_id = parse_video_id(video_id) or video_id
     selected_platforms = [] 
     
     if tutorial_blog :
@@ -174,81 +307,50 @@ if generate_clicked:
     if not selected_platforms:
         st.error("Please select at least one output format.")
     else:
-        result, error = asyncio.run(run_agent(processed_video_id, query, selected_platforms, gemini_api_key))
-        if error:
-            st.error(f" Error: {error}")
-        else:
-            for post in result:
-                platform = post["platform"]
-                content = post["content"]
-
-                final_post = summary = takeaways = blog = notes_content = ""
-                try:
-                    if platform.lower() == "summary":
-                        # summary_match = re.search(r"Summary\s*(.*?)\s*Key Takeaways\s*(.*?)$", content, re.DOTALL)
-                        summary_match = re.search(r"Summary\s*:\s*(.*?)\s*Key Takeaways\s*:\s*(.*?)$", content, re.DOTALL | re.IGNORECASE)
-                        if summary_match:
-                            summary = summary_match.group(1).strip()
-                            takeaways = summary_match.group(2).strip()
-                        else:
-                            summary = content.strip()
-                            takeaways = "No key takeaways extracted due to formatting issues."
-                    elif platform.lower() == "note taking":
-                        # note_match = re.search(r"Notes\s*:\s*(.*)", content, re.DOTALL)
-                        notes_match = re.search(r"Summary\s*:?\s*(.*?)\s*Main Notes\s*:?\s*(.*?)$", content, re.DOTALL | re.IGNORECASE)
-                        if notes_match:
-                            summary = notes_match.group(1).strip().replace("**", "")
-                            notes_content = notes_match.group(2).strip().replace("**", "")
-                        else:
-                            summary = content.strip()
-                            notes_content = "No key notes extracted due to formatting issues."
-                    else:
-                        final_match = re.search(r"Final Post:\s*(.*)", content)
-                        summary_match = re.search(r"Summary:\s*(.*)", content)
-                        blog_match = re.search(r"Blog:\s*(.*)", content, re.DOTALL)
-
-                        final_post = final_match.group(1).strip() if final_match else ""
-                        summary = summary_match.group(1).strip() if summary_match else ""
-                        blog = blog_match.group(1).strip() if blog_match else content.strip()
-                except:
-                    blog = content.strip()
-                    summary = blog = ""
-
-                with st.expander(f"📄 {platform} Output", expanded=True):
-                    if platform.lower() == "tutorial blog":
-                        st.markdown("#### 📝 Blog-style Tutorial")
-                        st.markdown(blog, unsafe_allow_html=False)
-                        st.download_button("📥 Download Blog Post", data=blog, file_name="tutorial_blog.md", mime="text/markdown", use_container_width=False)
-                    elif platform.lower() == "summary":
-                        st.markdown("### 📝 Summary")
-                        st.markdown(summary, unsafe_allow_html=False)
-                        st.markdown("### 🔑 Key Takeaways")
-                        st.markdown(takeaways, unsafe_allow_html=False)
-                        download_content = f"Summary:\n{summary}\n\nKey Takeaways:\n{takeaways}"
-                        st.download_button(label="📥 Download Summary", data=download_content, file_name="content_hub_summary.md", mime="text/markdown")
-                    elif platform.lower() == "note taking":
-                        st.markdown("### 📝 Notes")
-                        st.markdown(summary, unsafe_allow_html=False)
-                        st.markdown("###  Main Notes")
-                        st.markdown(notes_content, unsafe_allow_html=False)
-                        download_content = f"Summary:\n{summary}\n\nMain Notes:\n{notes_content}"
-                        st.download_button(label="📥 Download Notes", data=download_content, file_name="notes.md", mime="text/markdown")
-                    else:
-                        st.text_area("🪧 Final Post", final_post, height=100)
-                        if summary:
-                            st.markdown("**🧠 Summary**")
-                            st.markdown(summary)
-                        if blog:
-                            st.markdown("**📘 Blog Insight**")
-                            st.text_area("Blog", blog, height=200)
-
-                        st.download_button(
-                            label=f"📥 Download {platform} Content",
-                            data=f"{final_post}\n\n{summary}\n\n{blog}",
-                            file_name=f"{platform.lower()}_content.txt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
+        # The job runs in the background, so it survives reruns, disconnects and page refreshes
+        job = job_manager.submit(processed_video_id, selected_platforms, model_name, gemini_api_key, query, use_cache=not regenerate, trace=trace,
+                                 transcript=prefetcher.get(processed_video_id))
+        st.session_state.job_id = job.id
+        st.query_params["job"] = job.id
+
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+if job_id and entered_video_id:
+    # A different video was entered since that job started; show this video's state instead
+    previous_job = job_manager.get(job_id)
+    if previous_job is not None and previous_job.video_id != entered_video_id:
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+        job_id = None
+if not job_id and video_id:
+    # Another tab may already be generating for this video; attach to it instead of starting over
+    active_job = job_manager.find_active(parse_video_id(video_id) or video_id)
+    if active_job is not None:
+        st.caption("🔗 Attached to a generation already running for this video.")
+        job_id = st.session_state.job_id = active_job.id
+
+if job_id:
+    job = job_manager.get(job_id)
+    if job is None:
+        st.warning("That generation is no longer available. Please generate again.")
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+    elif job.finished:
+        show_job_results(job)
+        if show_debug:
+            show_debug_panel(job)
+    else:
+        watch_job(job_id)
+elif entered_video_id:
+    # Outputs generated for this video before, newest of each format
+    latest = {}
+    for artifact in get_saved_outputs(entered_video_id):
+        latest.setdefault(artifact.format, artifact)
+    if latest:
+        st.markdown("### 📚 Saved outputs for this video")
+        for platform, artifact in latest.items():
+            saved_on = datetime.datetime.fromtimestamp(artifact.created_at).strftime("%Y-%m-%d %H:%M")
+            st.caption(f"{platform} · {artifact.model} · generated {saved_on}")
+            render_post(platform, artifact.content)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+
+class Artifact(NamedTuple):
+    """One stored output. `snippet` is only set on search results, with matches in **bold**."""
+    id: int
+    video_id: str
+    format: str
+    model: str
+    prompt_version: str
+    query: str
+    content: str
+    created_at: float
+    snippet: Optional[str] = None
+
+
+_COLUMNS = "a.id, a.video_id, a.format, a.model, a.prompt_version, a.query, a.content, a.created_at"
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+TOUCH_INTERVAL = 3600  # seconds between view-time updates for a row, so reruns mostly just read
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query in which every word must match (after stemming).
+
+    Words are quoted, so operators and punctuation typed by users can't make the query invalid.
+    """
+    words = _WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+class ArtifactStore:
+    """Every generated output, kept in SQLite with a full-text index, for looking things up later.
+
+    One row per (video, format, model, prompt version, query); generating the same thing
+    again replaces the row. Beyond max_bytes the least recently viewed rows are dropped
+    as new ones arrive; compact() also drops rows older than retention_days and hands
+    the freed pages back to the filesystem.
+    """
+
+    def __init__(self, path: str, retention_days: float, max_bytes: int):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.stats = {"saved": 0, "lookups": 0, "searches": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Only takes effect on a new database; lets compact() free space without a full VACUUM
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id INTEGER PRIMARY KEY, video_id TEXT NOT NULL, format TEXT NOT NULL, model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL, query TEXT NOT NULL, content TEXT NOT NULL, size INTEGER NOT NULL,
+                created_at REAL NOT NULL, accessed_at REAL NOT NULL,
+                UNIQUE (video_id, format, model, prompt_version, query)
+            );
+            CREATE INDEX IF NOT EXISTS artifacts_accessed_at ON artifacts (accessed_at);
+            CREATE INDEX IF NOT EXISTS artifacts_created_at ON artifacts (created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS artifacts_fts USING fts5(
+                content, format UNINDEXED, content='artifacts', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS artifacts_ai AFTER INSERT ON artifacts BEGIN
+                INSERT INTO artifacts_fts (rowid, content, format) VALUES (new.id, new.content, new.format);
+            END;
+            CREATE TRIGGER IF NOT EXISTS artifacts_ad AFTER DELETE ON artifacts BEGIN
+                INSERT INTO artifacts_fts (artifacts_fts, rowid, content, format) VALUES ('delete', old.id, old.content, old.format);
+            END;
+            CREATE TRIGGER IF NOT EXISTS artifacts_au AFTER UPDATE OF content ON artifacts BEGIN
+                INSERT INTO artifacts_fts (artifacts_fts, rowid, content, format) VALUES ('delete', old.id, old.content, old.format);
+                INSERT INTO artifacts_fts (rowid, content, format) VALUES (new.id, new.content, new.format);
+            END;
+        """)
+        # Running total of stored text, so saving doesn't re-sum every row
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def save(self, video_id: str, platform: str, model: str, content: str, prompt_version: str, query: Optional[str] = None) -> int:
+        """Store an output, replacing an earlier one with the same key; returns its id."""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            if size > self.max_bytes:
+                return 0
+            previous = self._conn.execute(
+                "SELECT size FROM artifacts WHERE video_id = ? AND format = ? AND model = ? AND prompt_version = ? AND query = ?",
+                (video_id, platform, model, prompt_version, query or ""),
+            ).fetchone()
+            row = self._conn.execute(
+                "INSERT INTO artifacts (video_id, format, model, prompt_version, query, content, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id, format, model, prompt_version, query) DO UPDATE SET "
+                "content = excluded.content, size = excluded.size, created_at = excluded.created_at, accessed_at = excluded.accessed_at "
+                "RETURNING id",
+                (video_id, platform, model, prompt_version, query or "", content, size, now, now),
+            ).fetchone()
+            self._bytes += size - (previous[0] if previous else 0)
+            self.stats["saved"] += 1
+            self._evict()
+            return row[0]
+
+    def for_video(self, video_id: str) -> List[Artifact]:
+        """Every stored output for a video, newest first."""
+        with self._lock:
+            self.stats["lookups"] += 1
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS}, a.accessed_at FROM artifacts a WHERE a.video_id = ? ORDER BY a.created_at DESC", (video_id,)
+            ).fetchall()
+            stale = time.time() - TOUCH_INTERVAL
+            self._touch([row[0] for row in rows if row[-1] < stale])
+        return [Artifact(*row[:-1]) for row in rows]
+
+    def search(self, text: str, limit: int = 20, video_id: Optional[str] = None, platform: Optional[str] = None) -> List[Artifact]:
+        """Full-text search over every stored output, best match first."""
+        match = fts_query(text)
+        if match is None:
+            return []
+        sql = (f"SELECT {_COLUMNS}, snippet(artifacts_fts, 0, '**', '**', ' … ', 16) FROM artifacts_fts "
+               "JOIN artifacts a ON a.id = artifacts_fts.rowid WHERE artifacts_fts MATCH ?")
+        params = [match]
+        if video_id is not None:
+            sql += " AND a.video_id = ?"
+            params.append(video_id)
+        if platform is not None:
+            sql += " AND a.format = ?"
+            params.append(platform)
+        sql += " ORDER BY bm25(artifacts_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            self.stats["searches"] += 1
+            rows = self._conn.execute(sql, params).fetchall()
+        return [Artifact(*row) for row in rows]
+
+    def delete(self, artifact_id: int):
+        with self._lock:
+            self._delete(artifact_id)
+
+    def compact(self):
+        """Apply the retention policy, merge the full-text index and release freed pages to the filesystem."""
+        with self._lock:
+            self._expire()
+            self._evict()
+            self._conn.execute("INSERT INTO artifacts_fts (artifacts_fts) VALUES ('optimize')")
+            # execute() would step the pragma once and free a single page; executescript() runs it to completion
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            return {**self.stats, "entries": entries, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _touch(self, ids: list):
+        if ids:
+            self._conn.execute(f"UPDATE artifacts SET accessed_at = ? WHERE id IN ({', '.join('?' * len(ids))})", (time.time(), *ids))
+
+    def _delete(self, artifact_id: int):
+        row = self._conn.execute("DELETE FROM artifacts WHERE id = ? RETURNING size", (artifact_id,)).fetchone()
+        if row:
+            self._bytes -= row[0]
+
+    def _expire(self):
+        if self.retention_days > 0:
+            rows = self._conn.execute("DELETE FROM artifacts WHERE created_at < ? RETURNING size",
+                                      (time.time() - self.retention_days * 86400,)).fetchall()
+            self._bytes -= sum(size for size, in rows)
+            self.stats["expired"] += len(rows)
+
+    def _evict(self):
+        """Drop the least recently viewed outputs until the text fits in max_bytes."""
+        if self._bytes <= self.max_bytes:
+            return
+        for artifact_id, in self._conn.execute("SELECT id FROM artifacts ORDER BY accessed_at").fetchall():
+            if self._bytes <= self.max_bytes:
+                break
+            self._delete(artifact_id)
+            self.stats["evictions"] += 1
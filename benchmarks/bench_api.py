@@ -0,0 +1,174 @@
+"""Benchmark: load test of the HTTP API (server.py) against the fake backends.
+
+Starts the API in-process on a free port, with transcripts from a fake
+YouTubeTranscriptApi and generations from the fake Gemini server, then drives it
+from a pooled aiohttp client at each concurrency level. Three request kinds:
+
+  generate  - POST /v1/generate, latency until the whole JSON response arrives
+  stream    - POST /v1/generate/stream, also the time to the first `token` event
+  job       - POST /v1/jobs, then GET /v1/jobs/{id} until it finishes
+
+Every request uses its own video, so caches and request coalescing never help.
+Requests turned away with a 503 (over API_MAX_QUEUED_REQUESTS) are counted separately.
+
+Usage: python -m benchmarks.bench_api [--concurrency 1 8 32] [--requests 64] [--max-concurrent 16] [--max-queued 64]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.fake_transcripts import FakeTranscriptApi
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+MODEL = "gemini-2.5-flash"
+
+
+def video_id(label: str, concurrency: int, i: int) -> str:
+    return f"{label[:3]}{concurrency:03d}{i:05d}"[:11].ljust(11, "x")
+
+
+async def request_generate(session, base: str, body: dict) -> tuple:
+    async with session.post(f"{base}/v1/generate", json=body) as response:
+        payload = await response.json()
+    ok = response.status == 200 and not any("error" in result for result in payload.get("results", []))
+    return response.status, ok, None
+
+
+async def request_stream(session, base: str, body: dict) -> tuple:
+    started = time.perf_counter()
+    first_token, ok, event = None, False, None
+    async with session.post(f"{base}/v1/generate/stream", json=body) as response:
+        if response.status != 200:
+            await response.read()
+            return response.status, False, None
+        async for line in response.content:
+            line = line.decode("utf-8").strip()
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                ok = ok or event == "done"
+                if event == "error":
+                    break
+    return response.status, ok, first_token
+
+
+async def request_job(session, base: str, body: dict) -> tuple:
+    async with session.post(f"{base}/v1/jobs", json=body) as response:
+        job = await response.json()
+    if response.status != 202:
+        return response.status, False, None
+    while True:
+        await asyncio.sleep(0.02)
+        async with session.get(f"{base}/v1/jobs/{job['id']}") as response:
+            job = await response.json()
+        if job["status"] in ("done", "failed"):
+            return 200, job["status"] == "done" and not any("error" in result for result in job["results"]), job["first_token"]
+
+
+REQUESTS = {"generate": request_generate, "stream": request_stream, "job": request_job}
+
+
+async def run_level(base: str, kind: str, concurrency: int, requests: int, platforms: list) -> dict:
+    """Closed loop: `concurrency` clients issue `requests` requests in total over one pooled session."""
+    latencies, first_tokens, errors, rejected = [], [], 0, 0
+    counter = iter(range(requests))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def worker():
+            nonlocal errors, rejected
+            for i in counter:
+                body = {"video": video_id(kind, concurrency, i), "formats": platforms, "model": MODEL}
+                started = time.perf_counter()
+                status, ok, first_token = await REQUESTS[kind](session, base, body)
+                if status == 503:
+                    rejected += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+                if first_token is not None:
+                    first_tokens.append(first_token)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return {
+        "kind": kind,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rejected": rejected,
+        "ttft_p50": percentile(first_tokens, 50),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "throughput": len(latencies) / wall,
+    }
+
+
+async def run(args, platforms: list) -> list:
+    from aiohttp import web
+    import server
+
+    app = server.create_app("fake-key", max_concurrent=args.max_concurrent, max_queued=args.max_queued)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    try:
+        return [await run_level(base, kind, concurrency, args.requests, platforms)
+                for kind in args.kinds for concurrency in args.concurrency]
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", choices=list(REQUESTS), default=list(REQUESTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per kind and concurrency level")
+    parser.add_argument("--formats", type=int, default=3, choices=range(1, len(FORMATS) + 1))
+    parser.add_argument("--max-concurrent", type=int, default=16, help="API_MAX_CONCURRENT_REQUESTS for the server")
+    parser.add_argument("--max-queued", type=int, default=64, help="API_MAX_QUEUED_REQUESTS for the server")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini time to first token, seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--transcript-latency", type=float, default=0.3)
+    parser.add_argument("--transcript-snippets", type=int, default=400)
+    args = parser.parse_args()
+    platforms = FORMATS[:args.formats]
+
+    config = FakeGeminiConfig(first_token_delay=args.latency, chunk_delay=args.chunk_delay, chunks=args.chunks)
+    workdir = tempfile.mkdtemp(prefix="bench-api-")
+    with FakeGeminiServer(config) as fake:
+        os.environ["GEMINI_API_ENDPOINT"] = fake.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = workdir
+        os.environ["REQUEST_LOG_PATH"] = os.path.join(workdir, "requests.jsonl")
+        os.environ.setdefault("MAX_CONCURRENT_JOBS", str(args.max_concurrent))
+        os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+        import utils
+        import google.generativeai  # noqa: F401
+        utils.YouTubeTranscriptApi = FakeTranscriptApi.configured(args.transcript_latency, args.transcript_snippets)
+        results = asyncio.run(run(args, platforms))
+        gemini_calls, connections = fake.stats["requests"], fake.stats["connections"]
+
+    print(f"{'kind':>9} {'conc':>5} {'reqs':>5} {'errs':>5} {'503s':>5} {'ttft50':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'req/s':>7}")
+    for r in results:
+        print(f"{r['kind']:>9} {r['concurrency']:>5} {r['requests']:>5} {r['errors']:>5} {r['rejected']:>5} {r['ttft_p50']:>6.2f}s "
+              f"{r['p50']:>6.2f}s {r['p95']:>6.2f}s {r['p99']:>6.2f}s {r['throughput']:>7.2f}")
+    print(f"gemini calls: {gemini_calls}, gemini connections opened: {connections}")
+
+
+if __name__ == "__main__":
+    main()
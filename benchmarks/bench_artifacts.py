@@ -0,0 +1,73 @@
+"""Benchmark: artifacts.ArtifactStore lookups, full-text search and compaction as the store grows.
+
+Fills a fresh store with generated-looking outputs (three formats per video), then
+times saving, looking up one video's outputs, and searching across all of them, and
+shows the file size before and after deleting half the outputs and compacting.
+
+Usage: python -m benchmarks.bench_artifacts [--videos 1000 10000] [--chars 6000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from artifacts import ArtifactStore
+from benchmarks.bench_pipeline import percentile
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+TOPICS = ("docker compose kubernetes python install volume network deploy build cache query index server client "
+          "request latency model token prompt stream test config database migration schema backup").split()
+# A long tail of rarer words, so searches select a realistic share of the outputs
+VOCABULARY = TOPICS + [f"{topic}{i}" for topic in TOPICS for i in range(400)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def document(rng: random.Random, chars: int) -> str:
+    words = rng.choices(VOCABULARY, WEIGHTS, k=chars // 8)
+    return " ".join(words)[:chars]
+
+
+def timed_each(fn, args_list) -> list:
+    durations = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def file_mb(path: str) -> float:
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--chars", type=int, default=6000, help="characters per output")
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'videos':>7} {'save p50':>9} {'video p50':>10} {'video p99':>10} {'search p50':>11} {'search p99':>11} {'MB':>7} {'compacted':>10}")
+    for videos in args.videos:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-artifacts-"), "artifacts.sqlite3")
+        store = ArtifactStore(path, retention_days=0, max_bytes=2 ** 40)
+        saves = timed_each(store.save, [(f"{i:011d}", platform, "gemini-2.5-flash", document(rng, args.chars), "v1")
+                                        for i in range(videos) for platform in FORMATS])
+        lookups = timed_each(store.for_video, [(f"{rng.randrange(videos):011d}",) for _ in range(args.lookups)])
+        searches = timed_each(store.search, [(" ".join(rng.choices(VOCABULARY, WEIGHTS, k=2)),) for _ in range(args.lookups)])
+        size = file_mb(path)
+        store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        for i in range(0, videos, 2):
+            for artifact in store.for_video(f"{i:011d}"):
+                store.delete(artifact.id)
+        store.compact()
+        store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"{videos:>7} {percentile(saves, 50) * 1000:>7.2f}ms {percentile(lookups, 50) * 1000:>8.2f}ms "
+              f"{percentile(lookups, 99) * 1000:>8.2f}ms {percentile(searches, 50) * 1000:>9.2f}ms {percentile(searches, 99) * 1000:>9.2f}ms "
+              f"{size:>7.1f} {file_mb(path):>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark: single-prompt vs map-reduce generation for a long transcript.
+
+The fake server charges prefill time per prompt token, so latency grows with prompt
+size the way it does against the real API.
+
+Usage: python -m benchmarks.bench_chunking [--snippets 20000] [--chunk-tokens 20000]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+
+def make_transcript(snippets: int) -> str:
+    return "\n".join(f"In step {i} we run the command number {i} and check the output carefully." for i in range(snippets))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snippets", type=int, default=20000, help="transcript length in snippets (~18 tokens each)")
+    parser.add_argument("--chunk-tokens", type=int, default=20000)
+    parser.add_argument("--overlap-tokens", type=int, default=500)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--prefill", type=float, default=0.05, help="fake prefill seconds per 1k prompt tokens")
+    parser.add_argument("--platform", default="Summary")
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(first_token_delay=0.3, prefill_per_1k_tokens=args.prefill)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        import utils
+
+        transcript = make_transcript(args.snippets)
+        model = "gemini-2.5-flash"
+
+        start = time.perf_counter()
+        asyncio.run(utils.gemini_generate(utils.preview_prompt(transcript, args.platform), model, api_key="fake-key"))
+        single = time.perf_counter() - start
+
+        before = server.stats["requests"]
+        start = time.perf_counter()
+        asyncio.run(utils.generate_chunked(transcript, model, args.platform, "fake-key",
+                                           chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens,
+                                           parallelism=args.parallelism))
+        chunked = time.perf_counter() - start
+        calls = server.stats["requests"] - before
+
+    print(f"transcript: ~{utils.estimate_tokens(transcript)} tokens, {args.platform}")
+    print(f"single prompt: {single:.2f}s (1 call)")
+    print(f"map-reduce:    {chunked:.2f}s ({calls} calls, parallelism={args.parallelism})")
+
+
+if __name__ == "__main__":
+    main()
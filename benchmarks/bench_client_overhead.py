@@ -0,0 +1,83 @@
+"""Microbenchmark: per-call overhead of configuring a fresh Gemini client vs the pooled client.
+
+Measures client setup alone, then full sequential calls against a zero-latency fake
+server. Localhost hides TLS and DNS costs, so real-world savings per reused connection
+are larger than the end-to-end numbers here.
+
+Usage: python -m benchmarks.bench_client_overhead [--calls 50]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+
+def _fresh_client_call(genai, endpoint: str, prompt: str, model: str) -> str:
+    # The previous gemini_generate: reconfigure the SDK and build a new model on every call
+    genai.configure(api_key="fake-key", transport="rest", client_options={"api_endpoint": endpoint})
+    gemini_model = genai.GenerativeModel(model_name=model, generation_config=genai.types.GenerationConfig(temperature=0.7))
+    return "".join(chunk.text for chunk in gemini_model.generate_content(prompt, stream=True))
+
+
+def _fresh_client_setup(genai, endpoint: str, model: str):
+    from google.generativeai import client
+
+    genai.configure(api_key="fake-key", transport="rest", client_options={"api_endpoint": endpoint})
+    gemini_model = genai.GenerativeModel(model_name=model, generation_config=genai.types.GenerationConfig(temperature=0.7))
+    gemini_model._client = client.get_default_generative_client()
+    return gemini_model
+
+
+def _per_call(func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(first_token_delay=0.0, chunk_delay=0.0, chunks=3)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        import google.generativeai as genai
+        import utils
+
+        model = "gemini-2.5-flash"
+        fresh_setup = _per_call(lambda: _fresh_client_setup(genai, server.endpoint, model), args.calls)
+        pooled_setup = _per_call(lambda: utils.gemini_clients.get_model("fake-key", model, 0.7), args.calls)
+
+        _fresh_client_call(genai, server.endpoint, "warm-up", model)
+
+        connections = server.stats["connections"]
+        start = time.perf_counter()
+        for i in range(args.calls):
+            _fresh_client_call(genai, server.endpoint, f"prompt {i}", model)
+        fresh = (time.perf_counter() - start) / args.calls
+        fresh_connections = server.stats["connections"] - connections
+
+        async def pooled_calls():
+            await utils.gemini_generate("warm-up", model, api_key="fake-key")
+            start = time.perf_counter()
+            for i in range(args.calls):
+                await utils.gemini_generate(f"prompt {i}", model, api_key="fake-key")
+            return (time.perf_counter() - start) / args.calls
+
+        connections = server.stats["connections"]
+        pooled = asyncio.run(pooled_calls())
+        pooled_connections = server.stats["connections"] - connections
+
+    print(f"calls={args.calls}")
+    print(f"setup only: fresh {fresh_setup * 1000:.3f} ms/call, pooled {pooled_setup * 1000:.3f} ms/call")
+    print(f"fresh client per call: {fresh * 1000:.2f} ms/call, {fresh_connections} new connections")
+    print(f"pooled client:         {pooled * 1000:.2f} ms/call, {pooled_connections} new connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark: transcript compression ratio, its cost, and the generation latency it saves per format.
+
+Builds a noisy auto-generated-style transcript (filler words, [Music] markers, stutters
+and rolling-caption overlaps; deterministic for a given --seed), then:
+
+  1. compresses it with cleanup only and with each --budgets token target, reporting the
+     ratio and time, and checks that compressing again gives identical text
+  2. generates every format against the fake Gemini server, whose time to first token
+     grows with prompt size (--prefill-per-1k), with compression off and on, and reports
+     each format's latency and the time saved
+
+Usage: python -m benchmarks.bench_compression [--snippets 4000] [--budgets 20000 10000] [--prefill-per-1k 0.05]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+MODEL = "gemini-2.5-flash"
+SPEECH = ("so now we open the terminal and run docker compose up to start the database and the api server then we check the "
+          "logs and make sure the migration ran before we point the frontend at port 8080 and test the login flow").split()
+FILLERS = ["um", "uh", "you know", "like", "so", "basically", "okay"]
+MARKERS = ["[Music]", "[Applause]", "(laughter)", "♪", "[inaudible]"]
+
+
+def noisy_transcript(snippets: int, seed: int) -> str:
+    """Caption-like lines: ~8-word snippets with filler, stutters, markers and rolling overlaps."""
+    rng = random.Random(seed)
+    lines, position, previous = [], 0, []
+    for _ in range(snippets):
+        if rng.random() < 0.05:
+            lines.append(rng.choice(MARKERS))
+            continue
+        words = []
+        if previous and rng.random() < 0.3:
+            words.extend(previous[-rng.randint(3, 5):])  # rolling caption repeats the end of the last line
+        for _ in range(8):
+            word = SPEECH[position % len(SPEECH)]
+            position += 1
+            if rng.random() < 0.12:
+                words.append(rng.choice(FILLERS))
+            words.append(word)
+            if rng.random() < 0.06:
+                words.append(word)  # stutter
+        previous = words
+        lines.append(" ".join(words))
+    return "\n".join(lines)
+
+
+async def per_format_latency(utils, transcript: str) -> dict:
+    """Seconds each format's generation took, from the request's trace."""
+    from metrics import Trace, tracing
+    trace = Trace()
+    with tracing(trace):
+        results = await utils.generate_formats(transcript, MODEL, FORMATS, "fake-key", use_cache=False)
+    failed = [platform for platform, result in results.items() if isinstance(result, Exception)]
+    if failed:
+        raise RuntimeError(f"generation failed for {failed}: {results[failed[0]]}")
+    return {span["format"]: span["seconds"] for span in trace.to_dict()["spans"] if span["stage"] == "generation"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snippets", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[20000, 10000], help="token targets to compress to")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.05, help="fake Gemini seconds per 1k prompt tokens")
+    parser.add_argument("--rounds", type=int, default=3, help="generations per setting; the median is reported")
+    args = parser.parse_args()
+
+    from compression import compress_transcript
+    transcript = noisy_transcript(args.snippets, args.seed)
+    print(f"{'setting':>14} {'tokens':>8} {'ratio':>6} {'dropped':>8} {'ms':>8}")
+    for budget in [0] + args.budgets:
+        started = time.perf_counter()
+        result = compress_transcript(transcript, budget)
+        elapsed = time.perf_counter() - started
+        assert compress_transcript(transcript, budget).text == result.text, "compression is not deterministic"
+        label = f"budget {budget}" if budget else "cleanup only"
+        print(f"{label:>14} {result.output_tokens:>8} {result.ratio:>6.2f} {result.dropped_lines:>8} {elapsed * 1000:>8.1f}")
+    print(f"{'original':>14} {result.input_tokens:>8}   (deterministic: identical output on every run)\n")
+
+    config = FakeGeminiConfig(first_token_delay=0.2, chunk_delay=0.02, chunks=10, prefill_per_1k_tokens=args.prefill_per_1k)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-compression-")
+        os.environ["SHARED_CONTEXT_MODE"] = "off"  # one request per format, so each format's latency is its own
+        os.environ["CHUNKED_GENERATION_THRESHOLD"] = "0"
+        os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+        import utils
+        import google.generativeai  # noqa: F401
+
+        settings = [("off", False, 0), ("cleanup", True, 0)] + [(f"budget {b}", True, b) for b in args.budgets]
+        timings = {}
+        for label, enabled, budget in settings:
+            utils.TRANSCRIPT_COMPRESSION, utils.TRANSCRIPT_TOKEN_BUDGET = enabled, budget
+            rounds = [asyncio.run(per_format_latency(utils, transcript)) for _ in range(args.rounds)]
+            timings[label] = {platform: sorted(r[platform] for r in rounds)[len(rounds) // 2] for platform in FORMATS}
+
+    print(f"{'setting':>14} " + " ".join(f"{platform:>22}" for platform in FORMATS))
+    for label, latencies in timings.items():
+        cells = []
+        for platform in FORMATS:
+            saved = timings["off"][platform] - latencies[platform]
+            cells.append((f"{latencies[platform]:.2f}s" + (f" (-{saved:.2f}s)" if label != "off" else "")).rjust(22))
+        print(f"{label:>14} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
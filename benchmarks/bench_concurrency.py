@@ -0,0 +1,54 @@
+"""Benchmark: sequential vs concurrent Gemini generations against the fake API.
+
+Usage: python -m benchmarks.bench_concurrency [--formats 3] [--latency 1.0]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+
+async def _sequential(utils, prompts, model):
+    # Equivalent to the old behaviour, where each blocking stream held the event loop.
+    return [await utils.gemini_generate(p, model, api_key="fake-key") for p in prompts]
+
+
+async def _concurrent(utils, prompts, model):
+    return await asyncio.gather(*(utils.gemini_generate(p, model, api_key="fake-key") for p in prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--formats", type=int, default=3, help="number of formats generated per run")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake time to first token, seconds")
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(first_token_delay=args.latency, chunks=args.chunks)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        import utils
+
+        prompts = [f"prompt {i}" for i in range(args.formats)]
+        model = "gemini-2.5-flash"
+
+        start = time.perf_counter()
+        asyncio.run(_sequential(utils, prompts, model))
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(_concurrent(utils, prompts, model))
+        concurrent = time.perf_counter() - start
+
+    single = args.latency + config.chunk_delay * (config.chunks - 1)
+    print(f"formats={args.formats}  single call ~{single:.2f}s")
+    print(f"sequential: {sequential:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s")
+    print(f"speedup:    {sequential / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: Gemini tail latency with and without hedged requests.
+
+The fake server stalls a fraction of requests before their first token, the way a
+slow replica or a cold connection does. Each round issues the same calls through
+utils.gemini_generate, once without hedging and once with a fresh HedgePolicy, and
+reports latency percentiles next to the number of extra requests hedging cost.
+
+Usage: python -m benchmarks.bench_hedging [--requests 200] [--stall-rate 0.05] [--percentile 95]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+from hedging import HedgePolicy
+
+MODEL = "gemini-2.5-flash"
+
+
+async def run_round(utils, requests: int, concurrency: int) -> list:
+    latencies = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await utils.gemini_generate(f"Summarise request {i}.", MODEL, "fake-key")
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake time to first token, seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="fraction of requests that stall")
+    parser.add_argument("--stall-delay", type=float, default=3.0, help="extra seconds a stalled request waits")
+    parser.add_argument("--percentile", type=float, default=95, help="hedge after this TTFT percentile")
+    parser.add_argument("--budget", type=float, default=0.1, help="max hedges as a fraction of calls")
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(first_token_delay=args.latency, chunks=5, stall_rate=args.stall_rate, stall_delay=args.stall_delay)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-hedging-")
+        os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+        # Stalled losers hold a generation thread until the stall ends, so leave room for them
+        os.environ.setdefault("MAX_CONCURRENT_GENERATIONS", str(args.concurrency * 4))
+        import utils
+        import google.generativeai  # noqa: F401  (warm the lazy SDK import)
+
+        print(f"{'hedging':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'calls':>6} {'hedges':>6} {'won':>5}")
+        for percentile_setting in (0, args.percentile):
+            utils.hedge_policy = HedgePolicy(percentile=percentile_setting, budget=args.budget)
+            calls = server.stats["requests"]
+            latencies = asyncio.run(run_round(utils, args.requests, args.concurrency))
+            stats = utils.get_hedging_stats()
+            label = f"p{percentile_setting:g}" if percentile_setting else "off"
+            print(f"{label:>8} {percentile(latencies, 50):>6.2f}s {percentile(latencies, 95):>6.2f}s "
+                  f"{percentile(latencies, 99):>6.2f}s {max(latencies):>6.2f}s {server.stats['requests'] - calls:>6} "
+                  f"{stats['hedges']:>6} {stats['hedge_wins']:>5}")
+
+
+if __name__ == "__main__":
+    main()
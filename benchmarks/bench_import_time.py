@@ -0,0 +1,85 @@
+"""Benchmark: cold import cost of the project's modules, from `python -X importtime`.
+
+Each module is imported in a fresh interpreter, several times, and the best run is
+kept. Reports total import time, the heaviest dependencies pulled in, and whether the
+heavy SDKs that should load lazily were imported. Results are saved next to the
+pipeline benchmark's (benchmarks/results/import-<commit>.json) for comparison.
+
+Usage: python -m benchmarks.bench_import_time [--modules utils jobs cli] [--runs 5] [--compare FILE]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_pipeline import RESULTS_DIR, git_commit
+
+# Should only load on first use, never on `import utils`
+HEAVY_MODULES = ["streamlit", "google.generativeai", "grpc", "google.protobuf", "youtube_transcript_api", "requests", "aiohttp"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str) -> dict:
+    """One cold import: {module name: cumulative microseconds} as reported by -X importtime."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=REPO_ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative_us.isdigit():
+            cumulative[name] = int(cumulative_us)
+    return {"cumulative_us": cumulative, "heavy": [m for m in result.stdout.strip().split(",") if m]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["utils", "jobs", "cli"])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module; the fastest is kept")
+    parser.add_argument("--top", type=int, default=5, help="heaviest dependencies to list per module")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/import-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        best = min(profiles, key=lambda p: p["cumulative_us"].get(module, 0))
+        cumulative = best["cumulative_us"]
+        # Top-level dependencies only, i.e. what the module itself asked for
+        heaviest = sorted(((name, us) for name, us in cumulative.items() if name not in (module, "site", "encodings") and "." not in name),
+                          key=lambda item: item[1], reverse=True)[:args.top]
+        results.append({"module": module, "ms": cumulative.get(module, 0) / 1000, "heavy_loaded": best["heavy"],
+                        "heaviest": [{"module": name, "ms": us / 1000} for name, us in heaviest]})
+
+    for r in results:
+        heavy = ", ".join(r["heavy_loaded"]) or "none"
+        print(f"{r['module']:>8}: {r['ms']:7.1f} ms  (heavy modules loaded: {heavy})")
+        for dep in r["heaviest"]:
+            print(f"          {dep['module']:<28} {dep['ms']:7.1f} ms")
+
+    commit, dirty = git_commit()
+    report = {"commit": commit, "dirty": dirty, "python": sys.version.split()[0],
+              "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(), "results": results}
+    output = args.output or os.path.join(RESULTS_DIR, f"import-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["module"]: r for r in json.load(f)["results"]}
+        for r in results:
+            old = baseline.get(r["module"])
+            if old:
+                print(f"{r['module']:>8}: {old['ms']:7.1f} -> {r['ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark: peak memory of one request as transcripts and outputs grow.
+
+Runs the app's path, a background job that fetches the transcript and generates every
+format, against the fake transcript source and the fake Gemini server (in a child
+process, so its own buffers aren't counted). tracemalloc measures the peak Python
+allocation of each request above what was allocated before it started, and what the request left allocated once it finished. Each size uses its
+own video: the first request fetches and generates everything, then a repeat request
+for the same video is served from the caches. Results are saved as JSON; pass
+--compare with an earlier file to see the change.
+
+Usage: python -m benchmarks.bench_memory [--snippets 2000 20000 100000] [--output-chars 100000] [--shared-context auto] [--compare old.json]
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_pipeline import RESULTS_DIR, git_commit
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.fake_transcripts import FakeTranscriptApi
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+MODEL = "gemini-2.5-flash"
+
+
+def _serve(config: FakeGeminiConfig, endpoint, stop):
+    with FakeGeminiServer(config) as server:
+        endpoint.send(server.endpoint)
+        stop.wait()
+
+
+@contextlib.contextmanager
+def fake_gemini_process(config: FakeGeminiConfig):
+    """The fake Gemini server in a child process; yields its endpoint."""
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    stop = context.Event()
+    process = context.Process(target=_serve, args=(config, sender, stop), daemon=True)
+    process.start()
+    try:
+        yield receiver.recv()
+    finally:
+        stop.set()
+        process.join(timeout=5)
+
+
+def run_request(jobs, video_id: str) -> dict:
+    """Peak and retained MB of one job, measured from what was allocated before it started."""
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    job = jobs.job_manager.submit(video_id, FORMATS, MODEL, "fake-key")
+    while not job.finished:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    if job.error or job.errors:
+        raise RuntimeError(job.error or job.errors)
+    output_chars = sum(len(text) for text in job.results.values())
+    del job
+    current, peak = tracemalloc.get_traced_memory()
+    return {"peak_mb": (peak - baseline) / 2 ** 20, "retained_mb": (current - baseline) / 2 ** 20,
+            "seconds": elapsed, "output_chars": output_chars}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snippets", type=int, nargs="+", default=[2000, 20000, 100000], help="transcript lengths (~20 tokens per snippet)")
+    parser.add_argument("--output-chars", type=int, default=100_000, help="characters generated per format")
+    parser.add_argument("--chunk-size", type=int, default=200, help="characters per streamed chunk")
+    parser.add_argument("--shared-context", default="auto", help="SHARED_CONTEXT_MODE; off sends each format its own copy of the transcript")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/memory-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    chunk_text = ("lorem ipsum " * (args.chunk_size // 12 + 1))[:args.chunk_size]
+    config = FakeGeminiConfig(first_token_delay=0.05, chunk_delay=0.0, chunks=max(1, args.output_chars // args.chunk_size), chunk_text=chunk_text)
+    workdir = tempfile.mkdtemp(prefix="bench-memory-")
+    with fake_gemini_process(config) as endpoint:
+        os.environ["GEMINI_API_ENDPOINT"] = endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = workdir
+        os.environ["REQUEST_LOG_PATH"] = os.path.join(workdir, "requests.jsonl")
+        os.environ["CHUNKED_GENERATION_THRESHOLD"] = "0"  # one prompt with the whole transcript, the largest case
+        os.environ["SHARED_CONTEXT_MODE"] = args.shared_context
+        os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+        import utils
+        import jobs
+        import google.generativeai  # noqa: F401
+        results = []
+        for snippets in args.snippets:
+            utils.YouTubeTranscriptApi = FakeTranscriptApi.configured(latency=0.0, snippets=snippets)
+            transcript_chars = len(utils.get_transcript(f"probe{snippets:06d}"[:11], use_cache=False))
+            video_id = f"mem{snippets:08d}"[:11]
+            tracemalloc.start()
+            first = run_request(jobs, video_id)
+            repeat = run_request(jobs, video_id)
+            tracemalloc.stop()
+            results.append({"snippets": snippets, "transcript_mb": transcript_chars / 2 ** 20, **first,
+                            "repeat_peak_mb": repeat["peak_mb"], "repeat_retained_mb": repeat["retained_mb"]})
+
+    print(f"{'snippets':>9} {'transcript MB':>14} {'output chars':>13} {'peak MB':>8} {'peak/transcript':>16} {'retained MB':>12} "
+          f"{'repeat peak':>12} {'repeat kept':>12} {'seconds':>8}")
+    for r in results:
+        print(f"{r['snippets']:>9} {r['transcript_mb']:>14.2f} {r['output_chars']:>13} {r['peak_mb']:>8.1f} "
+              f"{r['peak_mb'] / r['transcript_mb']:>15.1f}x {r['retained_mb']:>12.1f} {r['repeat_peak_mb']:>12.1f} "
+              f"{r['repeat_retained_mb']:>12.1f} {r['seconds']:>8.2f}")
+
+    commit, dirty = git_commit()
+    report = {"commit": commit, "dirty": dirty, "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+              "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}, "results": results}
+    output = args.output or os.path.join(RESULTS_DIR, f"memory-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        previous = {r["snippets"]: r for r in baseline["results"]}
+        print(f"\nvs {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''}:")
+        for r in results:
+            old = previous.get(r["snippets"])
+            if old:
+                changes = [f"{label} {old[field]:.1f} -> {r[field]:.1f} MB" for label, field in
+                           (("peak", "peak_mb"), ("retained", "retained_mb"), ("repeat peak", "repeat_peak_mb")) if field in old]
+                print(f"{r['snippets']:>9} snippets: " + ", ".join(changes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: parsing generated output into sections, old regexes vs sections.SectionParser.
+
+Times both on well-formed outputs of growing size and on adversarial ones (many
+"Summary" headers with no "Main Notes" after them, which sent the old lazy regex back
+over the rest of the text for every header). Also checks that both agree on typical
+outputs, that adversarial ones fall back to the whole text as the summary, and that
+feeding any output in streamed chunks gives the same sections as parsing it whole.
+
+Usage: python -m benchmarks.bench_parser [--sizes 10000 100000 1000000]
+"""
+import argparse
+import re
+import time
+
+from sections import NO_NOTES, NO_TAKEAWAYS, SectionParser, parse_sections
+
+
+def regex_parse(platform: str, content: str) -> dict:
+    """The regex parsing render_post used before SectionParser, kept as the reference."""
+    if platform.lower() == "summary":
+        match = re.search(r"Summary\s*:\s*(.*?)\s*Key Takeaways\s*:\s*(.*?)$", content, re.DOTALL | re.IGNORECASE)
+        if match:
+            return {"summary": match.group(1).strip(), "takeaways": match.group(2).strip()}
+        return {"summary": content.strip(), "takeaways": "No key takeaways extracted due to formatting issues."}
+    if platform.lower() == "note taking":
+        match = re.search(r"Summary\s*:?\s*(.*?)\s*Main Notes\s*:?\s*(.*?)$", content, re.DOTALL | re.IGNORECASE)
+        if match:
+            return {"summary": match.group(1).strip().replace("**", ""), "notes": match.group(2).strip().replace("**", "")}
+        return {"summary": content.strip(), "notes": "No key notes extracted due to formatting issues."}
+    final_match = re.search(r"Final Post:\s*(.*)", content)
+    summary_match = re.search(r"Summary:\s*(.*)", content)
+    blog_match = re.search(r"Blog:\s*(.*)", content, re.DOTALL)
+    return {
+        "final_post": final_match.group(1).strip() if final_match else "",
+        "summary": summary_match.group(1).strip() if summary_match else "",
+        "blog": blog_match.group(1).strip() if blog_match else content.strip(),
+    }
+
+
+def body(chars: int) -> str:
+    line = "- The speaker explains step 3 and runs `make build` to check the output.\n"
+    return (line * (chars // len(line) + 1))[:chars]
+
+
+SAMPLES = {
+    "summary": lambda n: f"Summary: {body(n // 2)}\n\nKey Takeaways:\n{body(n // 2)}",
+    "note taking": lambda n: f"Summary\n{body(n // 2)}\n\nMain Notes:\n{body(n // 2)}",
+    "twitter": lambda n: f"Final Post: Ever wondered why builds fail? Watch →\nSummary: A short insight.\nBlog: {body(n)}",
+}
+ADVERSARIAL = {
+    # Every "Summary" starts a lazy scan to the end looking for "Main Notes"
+    "note taking": lambda n: "Summary " * (n // 8),
+    "summary": lambda n: "Summary: " * (n // 9),
+}
+# Neither has its second header, so the whole text is the summary
+ADVERSARIAL_FALLBACK = {"note taking": {"notes": NO_NOTES}, "summary": {"takeaways": NO_TAKEAWAYS}}
+
+
+def timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def streamed(platform: str, content: str, chunk: int = 37) -> dict:
+    parser = SectionParser(platform)
+    for i in range(0, len(content), chunk):
+        parser.feed(content[i:i + chunk])
+    return parser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--regex-limit", type=int, default=10_000, help="skip the old regex on adversarial inputs larger than this")
+    args = parser.parse_args()
+
+    for platform, make in SAMPLES.items():
+        content = make(2000)
+        expected = regex_parse(platform, content)
+        assert parse_sections(platform, content) == expected, platform
+        assert streamed(platform, content) == expected, platform
+    for platform, make in ADVERSARIAL.items():
+        content = make(2000)
+        expected = {"summary": content.strip(), **ADVERSARIAL_FALLBACK[platform]}
+        assert parse_sections(platform, content) == expected, platform
+        assert streamed(platform, content) == expected, platform
+    print("sections match the regex reference, whole and streamed, and adversarial inputs fall back\n")
+
+    print(f"{'input':>22} {'chars':>9} {'regex':>9} {'parser':>9} {'streamed':>9}")
+    for label, cases in (("typical", SAMPLES), ("adversarial", ADVERSARIAL)):
+        for platform, make in cases.items():
+            for size in args.sizes:
+                content = make(size)
+                skip = label == "adversarial" and size > args.regex_limit
+                regex = "skipped" if skip else f"{timed(regex_parse, platform, content) * 1000:.1f}ms"
+                started = time.perf_counter()
+                whole = parse_sections(platform, content)
+                parse_time = time.perf_counter() - started
+                started = time.perf_counter()
+                assert streamed(platform, content) == whole, f"{label} {platform} {size}: streamed sections differ"
+                stream_time = time.perf_counter() - started
+                print(f"{label + ' ' + platform:>22} {len(content):>9} {regex:>9} "
+                      f"{parse_time * 1000:>7.1f}ms {stream_time * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark: end-to-end pipeline latency, throughput and memory at varying concurrency.
+
+Runs entirely offline: transcripts come from a fake YouTubeTranscriptApi and
+generations from the fake Gemini server, both with configurable latency, size and
+error rate. Two entry points are measured:
+
+  job    - the app's path: a background job (transcript fetch + every format) via jobs.job_manager
+  posts  - get_transcript + generate_posts_for_all_platforms, the library path
+
+Every request uses its own video, so caches and request coalescing never help.
+Results are saved as JSON (by default benchmarks/results/<commit>.json); pass
+--compare with an earlier file to see the change per scenario and concurrency.
+
+Usage: python -m benchmarks.bench_pipeline [--concurrency 1 4 16] [--requests 32] [--compare benchmarks/results/abc1234.json]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.fake_transcripts import FakeTranscriptApi
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+MODEL = "gemini-2.5-flash"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, round(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def git_commit() -> tuple:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+async def run_job(jobs, video_id: str, platforms: list) -> bool:
+    job = jobs.job_manager.submit(video_id, platforms, MODEL, "fake-key")
+    while not job.finished:
+        await asyncio.sleep(0.005)
+    return not job.error and not job.errors
+
+
+async def run_posts(utils, video_id: str, platforms: list) -> bool:
+    transcript = await asyncio.to_thread(utils.get_transcript, video_id)
+    if not transcript:
+        return False
+    output = await utils.generate_posts_for_all_platforms(transcript, MODEL, platforms, "fake-key")
+    return not any(text.startswith("[Error") for text in output.values())
+
+
+async def run_level(request, concurrency: int, requests: int, label: str) -> dict:
+    """Closed loop: `concurrency` workers issue `requests` requests in total."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            ok = await request(f"{label}-{concurrency}-{i}")
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "scenario": label,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies),
+        "throughput": requests / wall,
+        "peak_traced_mb": tracemalloc.get_traced_memory()[1] / 2 ** 20,
+    }
+
+
+def print_results(results: list):
+    print(f"{'scenario':>8} {'conc':>5} {'reqs':>5} {'errs':>5} {'p50':>7} {'p95':>7} {'p99':>7} {'req/s':>7} {'peak MB':>8}")
+    for r in results:
+        print(f"{r['scenario']:>8} {r['concurrency']:>5} {r['requests']:>5} {r['errors']:>5} {r['p50']:>6.2f}s {r['p95']:>6.2f}s "
+              f"{r['p99']:>6.2f}s {r['throughput']:>7.2f} {r['peak_traced_mb']:>8.1f}")
+
+
+def print_comparison(results: list, baseline: dict):
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''}:")
+    print(f"{'scenario':>8} {'conc':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'peak MB':>8}")
+    for r in results:
+        old = previous.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        deltas = [(r[k] - old[k]) / old[k] * 100 if old[k] else 0.0 for k in ("p50", "p95", "p99", "throughput", "peak_traced_mb")]
+        print(f"{r['scenario']:>8} {r['concurrency']:>5} " + " ".join(f"{d:>+7.1f}%" for d in deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=["job", "posts"], default=["job", "posts"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario and concurrency level")
+    parser.add_argument("--formats", type=int, default=3, choices=range(1, len(FORMATS) + 1))
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini time to first token, seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="fake Gemini seconds between streamed chunks")
+    parser.add_argument("--chunks", type=int, default=10, help="streamed chunks per response")
+    parser.add_argument("--chunk-size", type=int, default=200, help="characters per streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Gemini requests failed with a 429")
+    parser.add_argument("--transcript-latency", type=float, default=0.3)
+    parser.add_argument("--transcript-snippets", type=int, default=400, help="transcript length (~20 tokens per snippet)")
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+    platforms = FORMATS[:args.formats]
+
+    chunk_text = ("lorem ipsum " * (args.chunk_size // 12 + 1))[:args.chunk_size]
+    config = FakeGeminiConfig(first_token_delay=args.latency, chunk_delay=args.chunk_delay, chunks=args.chunks,
+                              chunk_text=chunk_text, error_rate=args.error_rate)
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = workdir
+        os.environ["REQUEST_LOG_PATH"] = os.path.join(workdir, "requests.jsonl")
+        os.environ["MAX_CONCURRENT_JOBS"] = str(max(args.concurrency))
+        os.environ.setdefault("GEMINI_RETRY_BASE_DELAY", "0.1")
+        # Measure the pipeline rather than the client-side quota; override to benchmark throttling
+        os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+        import utils
+        import jobs
+        # utils loads the SDK lazily; import it up front so the first request isn't charged for it
+        import google.generativeai  # noqa: F401
+        utils.YouTubeTranscriptApi = FakeTranscriptApi.configured(args.transcript_latency, args.transcript_snippets, args.transcript_error_rate)
+        tracemalloc.start()
+
+        requests_by_scenario = {
+            "job": lambda video_id: run_job(jobs, video_id, platforms),
+            "posts": lambda video_id: run_posts(utils, video_id, platforms),
+        }
+        results = []
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                results.append(asyncio.run(run_level(requests_by_scenario[scenario], concurrency, args.requests, scenario)))
+        gemini_calls = server.stats["requests"]
+    tracemalloc.stop()
+
+    print_results(results)
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"gemini calls: {gemini_calls}, process max RSS: {max_rss_mb:.0f} MB")
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "max_rss_mb": max_rss_mb,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was run with different settings")
+        print_comparison(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
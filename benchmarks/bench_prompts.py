@@ -0,0 +1,55 @@
+"""Benchmark: cost of assembling prompts around a long transcript.
+
+Builds every format's prompt (and the combined multi-format prompt) the way a job
+does, and compares keeping them as Prompt pieces with joining them into one string,
+which is what every build used to do. Reports time per build and peak memory.
+
+Usage: python -m benchmarks.bench_prompts [--snippets 20000] [--rounds 50]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.fake_transcripts import FakeTranscriptApi
+from prompts import build_format_instructions, build_multi_format_prompt, build_transcript_context
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking", "Twitter", "LinkedIn"]
+
+
+def build_all(transcript: str, join: bool) -> int:
+    prompts = [build_transcript_context(transcript) + build_format_instructions(platform) for platform in FORMATS]
+    prompts.append(build_multi_format_prompt(transcript, FORMATS))
+    if join:
+        prompts = [str(prompt) for prompt in prompts]
+    return sum(len(prompt) for prompt in prompts)
+
+
+def measure(transcript: str, rounds: int, join: bool) -> tuple:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        build_all(transcript, join)
+    elapsed = (time.perf_counter() - started) / rounds
+    tracemalloc.start()
+    build_all(transcript, join)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snippets", type=int, default=20000, help="transcript length (~20 tokens per snippet)")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    snippets = FakeTranscriptApi.configured(latency=0, snippets=args.snippets)().fetch("bench")
+    transcript = "\n".join(snippet.text for snippet in snippets)
+    print(f"transcript: {len(transcript) / 2 ** 20:.1f} MB, {len(FORMATS) + 1} prompts per build")
+    print(f"{'assembly':>8} {'ms/build':>9} {'peak MB':>8}")
+    for label, join in (("joined", True), ("pieces", False)):
+        elapsed, peak = measure(transcript, args.rounds, join)
+        print(f"{label:>8} {elapsed * 1000:>9.2f} {peak / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
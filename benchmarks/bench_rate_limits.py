@@ -0,0 +1,54 @@
+"""Benchmark: scheduler behaviour under quota pressure and injected 429s.
+
+Fires a burst of concurrent generations at a fake server that enforces its own RPM
+quota and randomly fails requests, then reports how many succeeded, how many retries
+were needed and how long work sat in the scheduler's queue.
+
+Usage: python -m benchmarks.bench_rate_limits [--requests 40] [--server-rpm 120] [--error-rate 0.2]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--server-rpm", type=int, default=120, help="quota enforced by the fake server")
+    parser.add_argument("--client-rpm", type=float, default=None, help="scheduler budget (defaults to the server quota)")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="fraction of requests failed with a 429")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--base-delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(first_token_delay=0.05, chunk_delay=0.0, chunks=3,
+                              error_rate=args.error_rate, rate_limit_rpm=args.server_rpm)
+    with FakeGeminiServer(config) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["GEMINI_REQUESTS_PER_MINUTE"] = str(args.client_rpm if args.client_rpm is not None else args.server_rpm)
+        os.environ["GEMINI_MAX_RETRIES"] = str(args.retries)
+        os.environ["GEMINI_RETRY_BASE_DELAY"] = str(args.base_delay)
+        import utils
+
+        async def burst():
+            calls = [utils.gemini_generate(f"prompt {i}", "gemini-2.5-flash", api_key="fake-key") for i in range(args.requests)]
+            return await asyncio.gather(*calls, return_exceptions=True)
+
+        start = time.perf_counter()
+        results = asyncio.run(burst())
+        elapsed = time.perf_counter() - start
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    stats = utils.gemini_scheduler.get_stats()
+    print(f"{args.requests} requests in {elapsed:.1f}s: {args.requests - len(failures)} ok, {len(failures)} failed")
+    print(f"server: {server.stats['requests']} calls, {server.stats['errors']} rejected")
+    print(f"scheduler: {stats['retries']} retries, max queue depth {stats['max_queue_depth']}, "
+          f"wait avg {stats['wait_seconds_avg']:.2f}s / max {stats['wait_seconds_max']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: upstream calls when many users request the same video at once.
+
+Each simulated user runs on its own thread with its own event loop, like a Streamlit
+session, fetching the transcript and generating the same formats for one shared video.
+With coalescing the transcript and Gemini call counts should stay flat as users grow.
+
+Usage: python -m benchmarks.bench_singleflight [--users 1 5 10 25 50] [--formats 3]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.fake_transcripts import FakeTranscriptApi
+
+FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+
+
+def run_round(utils, video_id: str, users: int, platforms: list) -> float:
+    barrier = threading.Barrier(users)
+    failures = []
+
+    def user():
+        barrier.wait()
+        transcript = utils.get_transcript(video_id)
+        results = asyncio.run(utils.generate_formats(transcript, "gemini-2.5-flash", platforms, "fake-key"))
+        failures.extend(r for r in results.values() if isinstance(r, Exception))
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        print(f"  {len(failures)} generations failed, e.g. {failures[0]}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--formats", type=int, default=3, choices=range(1, len(FORMATS) + 1))
+    parser.add_argument("--latency", type=float, default=0.5, help="fake time to first token, seconds")
+    args = parser.parse_args()
+    platforms = FORMATS[:args.formats]
+
+    with FakeGeminiServer(FakeGeminiConfig(first_token_delay=args.latency, chunks=5)) as server:
+        os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+        os.environ["GEMINI_TRANSPORT"] = "rest"
+        os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-singleflight-")
+        import utils
+        transcripts = utils.YouTubeTranscriptApi = FakeTranscriptApi.configured(latency=0.3)
+
+        print(f"{'users':>5}  {'coalescing':>10}  {'transcript fetches':>18}  {'gemini calls':>12}  {'wall':>6}")
+        for users in args.users:
+            for enabled in (False, True):
+                utils.transcript_flights.enabled = enabled
+                utils.generation_flights.enabled = enabled
+                # A fresh video per round, so the caches start cold
+                video_id = f"v{users:03d}{'on' if enabled else 'off'}"
+                fetches, calls = transcripts.fetches, server.stats["requests"]
+                elapsed = run_round(utils, video_id, users, platforms)
+                print(f"{users:>5}  {'on' if enabled else 'off':>10}  {transcripts.fetches - fetches:>18}  "
+                      f"{server.stats['requests'] - calls:>12}  {elapsed:>5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
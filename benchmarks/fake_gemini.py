@@ -0,0 +1,207 @@
+"""Local stand-in for the Gemini REST API, used by the benchmarks.
+
+Serves `models/{model}:streamGenerateContent` as a streamed JSON array, the wire
+format the SDK's `rest` transport expects, with configurable latency. Context caches
+(`cachedContents`) can be created and deleted, and prompts asking for several formats
+get one marked section per format, so the app's shared-context paths work end to end.
+"""
+import collections
+import datetime
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGeminiConfig:
+    """Latency model: first token after first_token_delay plus prefill_per_1k_tokens per 1k prompt tokens.
+
+    Errors: each request fails with error_status at error_rate, and requests beyond
+    rate_limit_rpm in any 60s window get a 429, like an exhausted quota. Tail latency:
+    at stall_rate a request waits an extra stall_delay before its first token. With
+    cache_error_status set, creating a context cache fails with it, like a free-tier key.
+    """
+
+    def __init__(self, first_token_delay: float = 0.5, chunk_delay: float = 0.05, chunks: int = 10, chunk_text: str = "lorem ipsum ",
+                 prefill_per_1k_tokens: float = 0.0, error_rate: float = 0.0, error_status: int = 429, rate_limit_rpm: int = 0,
+                 stall_rate: float = 0.0, stall_delay: float = 5.0, cache_error_status: int = 0):
+        self.first_token_delay = first_token_delay
+        self.stall_rate = stall_rate
+        self.stall_delay = stall_delay
+        self.cache_error_status = cache_error_status
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_rpm = rate_limit_rpm
+        self.prefill_per_1k_tokens = prefill_per_1k_tokens
+        self.chunk_delay = chunk_delay
+        self.chunks = chunks
+        self.chunk_text = chunk_text
+
+
+def _chunk_payload(text: str, last: bool = False, prompt_tokens: int = 0, output_tokens: int = 0) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    payload = {"candidates": [candidate]}
+    if last:
+        candidate["finishReason"] = "STOP"
+        payload["usageMetadata"] = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                                    "totalTokenCount": prompt_tokens + output_tokens}
+    return payload
+
+
+ERROR_STATUSES = {400: "INVALID_ARGUMENT", 403: "PERMISSION_DENIED", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+FORMAT_MARKER_PATTERN = re.compile(r"<<<FORMAT: (.+?)>>>")
+
+
+def _prompt_text(body: bytes) -> str:
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError:
+        return ""
+    return "".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+
+
+def _response_text(config: FakeGeminiConfig, prompt: str) -> str:
+    """chunk_text repeated per chunk; with format markers in the prompt, one marked section per format."""
+    platforms = list(dict.fromkeys(FORMAT_MARKER_PATTERN.findall(prompt)))
+    if not platforms:
+        return config.chunk_text * config.chunks
+    per_section = max(1, config.chunks // len(platforms))
+    return "".join(f"<<<FORMAT: {platform}>>>\n{config.chunk_text * per_section}\n" for platform in platforms)
+
+
+def _split(text: str, pieces: int) -> list:
+    size = -(-len(text) // pieces)
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _make_handler(config: FakeGeminiConfig, stats: dict):
+    recent = collections.deque()  # request times inside the rate-limit window
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 with chunked bodies, so clients can keep connections alive like the real API
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Like production servers; otherwise Nagle + delayed ACKs add ~40ms per reused connection
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with stats["lock"]:
+                stats["connections"] += 1
+
+        def handle(self):
+            try:
+                super().handle()
+            except (ConnectionResetError, BrokenPipeError):
+                pass  # the client stopped reading, e.g. a cancelled hedge
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if self.path.split("?")[0].endswith("/cachedContents"):
+                self._create_cache(body)
+                return
+            now = time.monotonic()
+            with stats["lock"]:
+                stats["requests"] += 1
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                if config.rate_limit_rpm and len(recent) >= config.rate_limit_rpm:
+                    status = 429
+                elif random.random() < config.error_rate:
+                    status = config.error_status
+                else:
+                    status = None
+                    recent.append(now)
+                if status:
+                    stats["errors"] += 1
+            if status:
+                self._send_error(status)
+                return
+            prompt_tokens = len(body) / 4
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            text = _response_text(config, _prompt_text(body))
+            pieces = _split(text, config.chunks)
+            stall = config.stall_delay if random.random() < config.stall_rate else 0.0
+            time.sleep(config.first_token_delay + config.prefill_per_1k_tokens * prompt_tokens / 1000 + stall)
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(config.chunk_delay)
+                payload = json.dumps(_chunk_payload(piece, i == len(pieces) - 1, int(prompt_tokens), len(text) // 4)).encode("utf-8")
+                self._write_chunk((b"[" if i == 0 else b",\r\n") + payload)
+            self._write_chunk(b"]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _create_cache(self, body: bytes):
+            with stats["lock"]:
+                stats["cache_requests"] += 1
+            if config.cache_error_status:
+                self._send_error(config.cache_error_status)
+                return
+            with stats["lock"]:
+                stats["caches"] += 1
+                name = f"cachedContents/fake-{stats['caches']}"
+            request = json.loads(body or b"{}")
+            now = datetime.datetime.now(datetime.timezone.utc)
+            self._send_json(200, {
+                "name": name,
+                "model": request.get("model", ""),
+                "createTime": now.isoformat().replace("+00:00", "Z"),
+                "updateTime": now.isoformat().replace("+00:00", "Z"),
+                "expireTime": (now + datetime.timedelta(hours=1)).isoformat().replace("+00:00", "Z"),
+                "usageMetadata": {"totalTokenCount": len(body) // 4},
+            })
+
+        def do_DELETE(self):
+            self._send_json(200, {})
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_error(self, status: int):
+            self._send_json(status, {"error": {"code": status, "message": "Injected by fake server", "status": ERROR_STATUSES.get(status, "UNKNOWN")}})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class FakeGeminiServer:
+    """Run the fake API on a background thread: `with FakeGeminiServer() as server: ...`."""
+
+    def __init__(self, config: FakeGeminiConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeGeminiConfig()
+        self.stats = {"requests": 0, "errors": 0, "connections": 0, "caches": 0, "cache_requests": 0, "lock": threading.Lock()}
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self.config, self.stats))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,78 @@
+"""Local stand-in for `youtube_transcript_api.YouTubeTranscriptApi`, used by the benchmarks.
+
+Install it with `utils.YouTubeTranscriptApi = FakeTranscriptApi.configured(...)`.
+"""
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeTrack:
+    """One caption track, with the attributes and methods of the library's Transcript."""
+
+    def __init__(self, api: "FakeTranscriptApi", video_id: str, language_code: str, is_generated: bool = False,
+                 translation_languages: tuple = (), translated_from: str = None):
+        self._api = api
+        self.video_id = video_id
+        self.language_code = language_code
+        self.language = language_code
+        self.is_generated = is_generated
+        self.translation_languages = [SimpleNamespace(language=code, language_code=code) for code in translation_languages]
+        self._translated_from = translated_from
+
+    @property
+    def is_translatable(self) -> bool:
+        return bool(self.translation_languages)
+
+    def translate(self, language_code: str) -> "FakeTrack":
+        if language_code not in {language.language_code for language in self.translation_languages}:
+            raise RuntimeError(f"{self.language_code} cannot be translated to {language_code}")
+        return FakeTrack(self._api, self.video_id, language_code, True, translated_from=self.language_code)
+
+    def fetch(self):
+        api = type(self._api)
+        with api._lock:
+            api.fetches += 1
+        time.sleep(api.latency)
+        if random.random() < api.error_rate:
+            raise RuntimeError(f"Injected transcript failure for {self.video_id}")
+        language = f"{self._translated_from}->{self.language_code}" if self._translated_from else self.language_code
+        return [SimpleNamespace(text=f"In step {i} of the {self.video_id} walkthrough ({language}) we run command {i} and check the output.",
+                                start=i * 2.0, duration=2.0)
+                for i in range(api.snippets)]
+
+
+class FakeTranscriptApi:
+    """Serves generated snippets after `latency` seconds, failing at `error_rate`; counts listings and fetches.
+
+    Each video has the caption tracks in `tracks`: (language code, is auto-generated,
+    languages it can be translated to).
+    """
+
+    latency = 0.3
+    snippets = 200
+    error_rate = 0.0
+    tracks = (("en", False, ()),)
+    fetches = 0
+    listings = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def configured(cls, latency: float = 0.3, snippets: int = 200, error_rate: float = 0.0, tracks: tuple = None) -> type:
+        """A subclass with its own settings and counters."""
+        return type(cls.__name__, (cls,), {"latency": latency, "snippets": snippets, "error_rate": error_rate,
+                                           "tracks": tracks or cls.tracks, "fetches": 0, "listings": 0, "_lock": threading.Lock()})
+
+    def list(self, video_id):
+        cls = type(self)
+        with cls._lock:
+            cls.listings += 1
+        time.sleep(self.latency)
+        return [FakeTrack(self, video_id, code, generated, translations) for code, generated, translations in self.tracks]
+
+    def fetch(self, video_id, languages=("en",)):
+        wanted = [track for track in self.list(video_id) if track.language_code in languages]
+        if not wanted:
+            raise RuntimeError(f"No transcript in {languages} for {video_id}")
+        return wanted[0].fetch()
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+HASH_BLOCK_CHARS = 1 << 20  # long pieces are encoded this much at a time rather than copied whole
+
+
+def cache_key(*parts) -> str:
+    """Content-address a cache entry: sha256 over the key parts.
+
+    A prompts.Prompt is hashed piece by piece, which gives the same key as its joined text.
+    A multi-hour transcript is hashed in blocks, so keying a prompt never holds a second
+    full copy of it.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        for piece in getattr(part, "parts", (part,)):
+            text = str(piece)
+            for start in range(0, len(text), HASH_BLOCK_CHARS):
+                digest.update(text[start:start + HASH_BLOCK_CHARS].encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU bounded by the total size of its values, with per-entry expiry.
+
+    Values are kept by reference, so every caller of get() shares one object. The caller
+    says how big each value is; one larger than max_bytes is not kept at all.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, expires_at = entry
+            if time.time() >= expires_at:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int, expires_at: float):
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+class DiskCache:
+    """SQLite-backed string cache with a TTL, size-bounded LRU eviction and an in-process memo layer.
+
+    One instance is shared by every Streamlit session in the worker process, so repeat
+    lookups are served from memory and fall back to disk across restarts. The memo layer
+    holds at most memory_bytes of values; 0 turns it off.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int, memory_bytes: int = 32 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._memory = MemoryCache(memory_bytes)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return value
+
+            row = self._conn.execute("SELECT value, size, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, size, created_at = row
+            if now - created_at >= self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._memory.set(key, value, size, created_at + self.ttl_seconds)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._memory.set(key, value, size, now + self.ttl_seconds)
+            self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._memory.delete(key)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return {**self.stats, "entries": entries, "bytes": total, "max_bytes": self.max_bytes, "memory": self._memory.get_stats()}
+
+    def _evict(self):
+        """Drop least-recently-used disk entries until the cache fits in max_bytes.
+
+        The memo layer is bounded separately, so hot entries may outlive their disk copy.
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
@@ -0,0 +1,75 @@
+import re
+from typing import List, Sequence, Union
+
+CHARS_PER_TOKEN = 4  # Rough average for English text with Gemini's tokenizer
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting windows before sending."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_units(transcript: Union[str, Sequence[str]], max_tokens: int) -> List[str]:
+    """Split a transcript into snippet-sized units no larger than max_tokens.
+
+    get_transcript keeps one snippet per line, so lines are the natural boundary.
+    A unit that is still too large (e.g. a transcript cached as one long line) is
+    cut at sentence ends, then at word boundaries.
+    """
+    lines = transcript.splitlines() if isinstance(transcript, str) else list(transcript)
+    units = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if estimate_tokens(line) <= max_tokens:
+            units.append(line)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", line):
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+            words, size = [], 0
+            for word in sentence.split():
+                word_tokens = estimate_tokens(word) + 1
+                if words and size + word_tokens > max_tokens:
+                    units.append(" ".join(words))
+                    words, size = [], 0
+                words.append(word)
+                size += word_tokens
+            if words:
+                units.append(" ".join(words))
+    return units
+
+
+def chunk_transcript(transcript: Union[str, Sequence[str]], chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """Group snippets into token-budgeted windows.
+
+    Each window after the first repeats up to overlap_tokens of trailing snippets from
+    the previous one, so steps that straddle a boundary are seen whole at least once.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, chunk_tokens // 2))
+
+    chunks = []
+    window, window_tokens = [], 0
+    for unit in split_units(transcript, chunk_tokens):
+        unit_tokens = estimate_tokens(unit) + 1
+        if window and window_tokens + unit_tokens > chunk_tokens:
+            chunks.append("\n".join(window))
+            carried, carried_tokens = [], 0
+            for previous in reversed(window):
+                previous_tokens = estimate_tokens(previous) + 1
+                if carried_tokens + previous_tokens > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+            while carried and carried_tokens + unit_tokens > chunk_tokens:
+                carried_tokens -= estimate_tokens(carried.pop(0)) + 1
+            window, window_tokens = carried, carried_tokens
+        window.append(unit)
+        window_tokens += unit_tokens
+    if window:
+        chunks.append("\n".join(window))
+    return chunks
@@ -0,0 +1,189 @@
+"""Headless batch generation: turn a list of YouTube videos into tutorials, summaries and notes.
+
+Usage:
+    python cli.py videos.txt --formats "Tutorial Blog" Summary --output-dir out
+    cat videos.txt | python cli.py - --output-format jsonl --output-dir out
+
+Each input line is a video URL or ID (blank lines and `#` comments are ignored).
+Outputs that already exist for the same model and query are skipped, so an interrupted
+run can simply be restarted; --regenerate redoes them.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+from typing import Optional
+
+from cache import cache_key
+from metrics import Trace, log_trace, tracing
+from routing import AUTO_MODEL
+from utils import (parse_video_id, get_transcript, generate_formats, get_available_models, resolve_models, save_artifacts, VALID_PLATFORMS,
+                   REQUEST_LOG_PATH)
+
+JSONL_FILE_NAME = "results.jsonl"
+
+
+def read_video_ids(lines) -> list:
+    """Parse URLs / IDs, dropping blanks, comments, invalid entries and duplicates."""
+    video_ids = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        video_id = parse_video_id(line)
+        if video_id is None:
+            print(f"[Input] Skipping unrecognised entry: {line}", file=sys.stderr)
+        elif video_id not in video_ids:
+            video_ids.append(video_id)
+    return video_ids
+
+
+def format_slug(platform: str) -> str:
+    return platform.lower().replace(" ", "_")
+
+
+class ResultWriter:
+    """Writes one output per (video, format, model, query) and knows which ones already exist."""
+
+    def __init__(self, output_dir: str, output_format: str, model: str, query: Optional[str] = None):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.model = model
+        self.query = query
+        os.makedirs(output_dir, exist_ok=True)
+        self._done = set()
+        if output_format == "jsonl":
+            self._jsonl_path = os.path.join(output_dir, JSONL_FILE_NAME)
+            if os.path.exists(self._jsonl_path):
+                with open(self._jsonl_path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # partial line from an interrupted run
+                        if record.get("model") == model and record.get("query") == query:
+                            self._done.add((record["video_id"], record["format"]))
+
+    def _markdown_path(self, video_id: str, platform: str) -> str:
+        """<video>/<format>.md for auto routing without a query; a model or query adds a suffix."""
+        suffix = "" if self.model == AUTO_MODEL else f".{self.model}"
+        if self.query:
+            suffix += f".q-{cache_key(self.query)[:8]}"
+        return os.path.join(self.output_dir, video_id, f"{format_slug(platform)}{suffix}.md")
+
+    def is_done(self, video_id: str, platform: str) -> bool:
+        if self.output_format == "jsonl":
+            return (video_id, platform) in self._done
+        return os.path.exists(self._markdown_path(video_id, platform))
+
+    def write(self, video_id: str, platform: str, content: str, routed_model: str):
+        if self.output_format == "jsonl":
+            record = {
+                "video_id": video_id,
+                "format": platform,
+                "model": self.model,
+                "routed_model": routed_model,
+                "query": self.query,
+                "content": content,
+                "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+            with open(self._jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._done.add((video_id, platform))
+        else:
+            path = self._markdown_path(video_id, platform)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a killed run never leaves a half-written file that looks done
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+
+
+async def process_video(video_id: str, platforms: list, args, writer: ResultWriter,
+                        transcript_slots: asyncio.Semaphore, generation_slots: asyncio.Semaphore, stats: dict):
+    pending = list(platforms) if args.regenerate else [platform for platform in platforms if not writer.is_done(video_id, platform)]
+    stats["skipped"] += len(platforms) - len(pending)
+    if not pending:
+        return
+
+    trace = Trace()
+    with tracing(trace):
+        failed = await _generate_video(video_id, pending, args, writer, transcript_slots, generation_slots, stats)
+    log_trace(trace, REQUEST_LOG_PATH, video_id=video_id, model=args.model, formats=pending, status="failed" if failed else "done")
+
+
+async def _generate_video(video_id: str, pending: list, args, writer: ResultWriter,
+                          transcript_slots: asyncio.Semaphore, generation_slots: asyncio.Semaphore, stats: dict) -> int:
+    """Generate the formats still missing for one video; returns how many failed."""
+    async with transcript_slots:
+        transcript = await asyncio.to_thread(get_transcript, video_id)
+    if not transcript:
+        print(f"[{video_id}] No transcript found", file=sys.stderr)
+        stats["failed"] += len(pending)
+        return len(pending)
+
+    models = resolve_models(transcript, pending, args.model)
+    async with generation_slots:
+        try:
+            results = await generate_formats(transcript, models, pending, args.api_key, args.query, use_cache=not args.regenerate)
+        except Exception as e:
+            results = {platform: e for platform in pending}
+    save_artifacts(video_id, results, models, args.query)
+    failed = 0
+    for platform, result in results.items():
+        if isinstance(result, Exception) or not result:
+            print(f"[{video_id}] {platform} failed: {result}", file=sys.stderr)
+            stats["failed"] += 1
+            failed += 1
+        else:
+            writer.write(video_id, platform, result, models[platform])
+            stats["generated"] += 1
+            print(f"[{video_id}] {platform} done ({models[platform]})", file=sys.stderr)
+    return failed
+
+
+async def run_batch(video_ids: list, platforms: list, args) -> dict:
+    writer = ResultWriter(args.output_dir, args.output_format, args.model, args.query)
+    transcript_slots = asyncio.Semaphore(args.transcript_workers)
+    generation_slots = asyncio.Semaphore(args.generation_workers)
+    stats = {"generated": 0, "skipped": 0, "failed": 0}
+    await asyncio.gather(*(
+        process_video(video_id, platforms, args, writer, transcript_slots, generation_slots, stats)
+        for video_id in video_ids
+    ))
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate tutorials, summaries and notes for many YouTube videos.")
+    parser.add_argument("input", help="file with one video URL or ID per line, or - for stdin")
+    parser.add_argument("--formats", nargs="+", default=["Tutorial Blog", "Summary", "Note Taking"], choices=VALID_PLATFORMS)
+    parser.add_argument("--model", default=AUTO_MODEL, choices=[AUTO_MODEL] + get_available_models(),
+                        help="model for every format, or auto to pick one per format")
+    parser.add_argument("--query", default=None, help="optional instruction added to every prompt")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--output-format", choices=["markdown", "jsonl"], default="markdown")
+    parser.add_argument("--transcript-workers", type=int, default=8, help="concurrent transcript fetches")
+    parser.add_argument("--generation-workers", type=int, default=4, help="videos generating concurrently")
+    parser.add_argument("--regenerate", action="store_true", help="redo outputs that already exist, ignoring the generation cache")
+    parser.add_argument("--api-key", default=os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY_STR"))
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+
+    if args.input == "-":
+        video_ids = read_video_ids(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            video_ids = read_video_ids(f)
+
+    stats = asyncio.run(run_batch(video_ids, args.formats, args))
+    print(f"{len(video_ids)} videos: {stats['generated']} generated, {stats['skipped']} skipped, {stats['failed']} failed", file=sys.stderr)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
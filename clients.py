@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import google.ai.generativelanguage as glm
+    import google.generativeai as genai
+
+
+class GeminiClientPool:
+    """Process-wide Gemini clients and models, shared by every Streamlit session.
+
+    One GenerativeServiceClient (and so one warm channel / HTTP connection pool) is kept
+    per API key, and one GenerativeModel per (api_key, model, temperature). Rotating keys
+    simply creates a new entry; the least recently used keys beyond max_keys are dropped.
+    Dropping only releases the pool's reference, so in-flight calls on an old client finish
+    normally. The SDK is imported when the first client or model is created.
+    """
+
+    def __init__(self, transport: Optional[str] = None, api_endpoint: Optional[str] = None, max_keys: int = 16):
+        self.transport = transport
+        self.api_endpoint = api_endpoint
+        self.max_keys = max_keys
+        self._clients = OrderedDict()  # api_key -> GenerativeServiceClient
+        self._models = {}  # (api_key, model, temperature) -> GenerativeModel
+        self._lock = threading.Lock()
+
+    def get_client(self, api_key: str) -> "glm.GenerativeServiceClient":
+        with self._lock:
+            return self._get_client(api_key)
+
+    def get_model(self, api_key: str, model: str, temperature: float) -> "genai.GenerativeModel":
+        key = (api_key, model, temperature)
+        with self._lock:
+            gemini_model = self._models.get(key)
+            if gemini_model is None:
+                import google.generativeai as genai
+
+                gemini_model = genai.GenerativeModel(
+                    model_name=model,
+                    generation_config=genai.types.GenerationConfig(temperature=temperature),
+                )
+                gemini_model._client = self._get_client(api_key)
+                self._models[key] = gemini_model
+            else:
+                self._clients.move_to_end(api_key)
+            return gemini_model
+
+    def get_cached_content_model(self, api_key: str, cached_content, temperature: float) -> "genai.GenerativeModel":
+        """Model bound to a context cache; not pooled since caches are short-lived."""
+        import google.generativeai as genai
+        gemini_model = genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=genai.types.GenerationConfig(temperature=temperature),
+        )
+        gemini_model._client = self.get_client(api_key)
+        return gemini_model
+
+    def invalidate(self, api_key: str):
+        """Forget a key's client and models, e.g. after the API rejected the credentials."""
+        with self._lock:
+            self._drop(api_key)
+
+    def _get_client(self, api_key: str) -> "glm.GenerativeServiceClient":
+        client = self._clients.get(api_key)
+        if client is not None:
+            self._clients.move_to_end(api_key)
+            return client
+
+        import google.ai.generativelanguage as glm
+
+        client_options = {"api_key": api_key}
+        if self.api_endpoint:
+            client_options["api_endpoint"] = self.api_endpoint
+        options = {"client_options": client_options}
+        if self.transport:
+            options["transport"] = self.transport
+        client = glm.GenerativeServiceClient(**options)
+
+        self._clients[api_key] = client
+        while len(self._clients) > self.max_keys:
+            self._drop(next(iter(self._clients)))
+        return client
+
+    def _drop(self, api_key: str):
+        self._clients.pop(api_key, None)
+        for key in [key for key in self._models if key[0] == api_key]:
+            del self._models[key]
@@ -0,0 +1,158 @@
+import re
+from typing import List, NamedTuple, Tuple
+
+from chunking import estimate_tokens
+
+# Captioning annotations for sounds rather than speech: [Music], (applause), ♪ ...
+NON_SPEECH_PATTERN = re.compile(
+    r"[\[(]\s*(?:music|applause|laughter|laughs|laughing|inaudible|silence|noise|cheering|foreign|crosstalk|"
+    r"background music|sound effects?|no audio|blank audio)\s*[\])]|[♪♫]+|^\s*>>\s*",
+    re.IGNORECASE,
+)
+# Only shapes that are never words: "mm" (millimetres) and "hm" (HM, Her Majesty) need a third letter
+FILLER_PATTERN = re.compile(r"(?<![\w'-])(?:mm-hmm|uh-huh|u+m+|u+h+m*|e+r+m+|h+m{2,}|mhm|m{3,})(?![\w'-])[,.]?", re.IGNORECASE)
+MAX_REPEAT_NGRAM = 4  # longest phrase collapsed when said twice in a row ("we need to we need to")
+# Never doubled in a grammatical sentence, so saying one twice is a stutter ("I I think", "the the")
+STUTTER_WORDS = frozenset("i a an the and or but we you of to".split())
+MIN_WORD_REPEATS = 3  # any other word only collapses said this many times in a row: "I had had enough" means it
+MIN_CAPTION_OVERLAP = 3  # words a line must repeat from the end of the previous one to count as a rolling-caption overlap
+STOPWORDS = frozenset("""
+a an and are as at be but by do for from go going gonna have here i if in into is it its just know like me my of okay on or
+right so that the then there this to uh we what with yeah you your actually really basically kind sort well now get got let
+that's it's we're you're i'm let's there's thing things stuff something gonna wanna oh ok alright all
+""".split())
+# Commands, paths, numbers and code are what tutorials are made of; lines with them are never dropped first
+TECHNICAL_PATTERN = re.compile(r"\d|[`/\\=_{}()<>$#]|\.\w|(?:^|\s)--?\w")
+
+
+class CompressionResult(NamedTuple):
+    text: str
+    input_tokens: int
+    output_tokens: int
+    dropped_lines: int  # removed to meet the token budget, on top of the cleanup
+
+    @property
+    def ratio(self) -> float:
+        """Output size as a fraction of the input (1.0 means unchanged)."""
+        return self.output_tokens / self.input_tokens if self.input_tokens else 1.0
+
+
+def _key(word: str) -> str:
+    return word.strip(".,!?;:\"'").lower()
+
+
+def _literal(word: str, key: str) -> bool:
+    """Numbers, paths, flags and short all-caps names ("C", "SQL"): repeating them is meant, not a stutter."""
+    stripped = word.strip(".,!?;:\"'")
+    return bool(TECHNICAL_PATTERN.search(word)) or (stripped.isupper() and len(stripped) <= 5 and key not in STOPWORDS)
+
+
+def _word_run(keys: List[str]) -> int:
+    """How many times the last key is repeated at the end of keys."""
+    run = 1
+    while run < len(keys) and keys[-1 - run] == keys[-1]:
+        run += 1
+    return run
+
+
+def collapse_repeats(words: List[str], max_n: int = MAX_REPEAT_NGRAM) -> Tuple[List[str], List[str]]:
+    """Drop stutters and restarted phrases ("the the", "so we so we"), keeping the first.
+
+    A single word collapses when it is one of STUTTER_WORDS said twice, or any other word
+    said MIN_WORD_REPEATS times ("no no no"); 2..max_n-word phrases collapse when said
+    twice. Phrases with a literal token ("press Ctrl C Ctrl C", "2 2") are kept as said.
+    Returns the words left and their comparison keys.
+    """
+    out, keys, literal = [], [], []
+    collapsed = None  # key of the single-word run just collapsed; more of it is dropped as it comes
+    for word in words:
+        key = _key(word)
+        if key == collapsed:
+            continue
+        collapsed = None
+        out.append(word)
+        keys.append(key)
+        literal.append(_literal(word, key))
+        if key and not literal[-1]:
+            run = _word_run(keys)
+            if run >= (2 if key in STUTTER_WORDS else MIN_WORD_REPEATS):
+                del out[-(run - 1):], keys[-(run - 1):], literal[-(run - 1):]
+                collapsed = key
+                continue
+        for n in range(2, max_n + 1):
+            if (len(keys) >= 2 * n and keys[-1] == keys[-1 - n] and keys[-n:] == keys[-2 * n:-n] and any(keys[-n:])
+                    and not any(literal[-n:])):
+                del out[-n:], keys[-n:], literal[-n:]
+                break
+    return out, keys
+
+
+def clean_line(line: str) -> Tuple[List[str], List[str]]:
+    """The words of one snippet without non-speech markers, filler words or stutters, with their keys."""
+    line = NON_SPEECH_PATTERN.sub(" ", line)
+    line = FILLER_PATTERN.sub(" ", line)
+    if not any(char.isalnum() for char in line):
+        return [], []
+    return collapse_repeats(line.split())
+
+
+def _overlap(previous_keys: List[str], keys: List[str]) -> int:
+    """Auto-generated captions roll: how many leading words of a snippet repeat the end of the last one."""
+    for size in range(min(len(previous_keys), len(keys)), MIN_CAPTION_OVERLAP - 1, -1):
+        if previous_keys[-size:] == keys[:size]:
+            return size
+    return 0
+
+
+def _information(line: str) -> float:
+    """Rough information density: share of distinct content words, plus a bonus for anything technical."""
+    keys = [_key(word) for word in line.split()]
+    content = {key for key in keys if key and key not in STOPWORDS}
+    return len(content) / len(keys) + (1.0 if TECHNICAL_PATTERN.search(line) else 0.0) if keys else 0.0
+
+
+def fit_budget(lines: List[str], target_tokens: int) -> List[str]:
+    """Drop the least informative lines until the rest fit in target_tokens, keeping the original order.
+
+    Ties go to the later line, so the result depends only on the input.
+    """
+    sizes = [estimate_tokens(line) + 1 for line in lines]
+    total = sum(sizes)
+    if total <= target_tokens:
+        return lines
+    keep = [True] * len(lines)
+    for index in sorted(range(len(lines)), key=lambda i: (_information(lines[i]), -i)):
+        if total <= target_tokens:
+            break
+        keep[index] = False
+        total -= sizes[index]
+    return [line for line, kept in zip(lines, keep) if kept]
+
+
+def compress_transcript(text: str, target_tokens: int = 0) -> CompressionResult:
+    """Clean a transcript (one snippet per line) and optionally shrink it to target_tokens.
+
+    Removes non-speech markers, filler words, stutters, repeated phrases and the overlap
+    between rolling auto-generated captions, then drops the emptied lines and exact repeats of
+    the previous line. With target_tokens > 0, the least informative lines are dropped until
+    the estimate fits. A pure function of its inputs, so identical transcripts give identical
+    prompts and the generation cache keeps working.
+    """
+    lines, previous_keys = [], []
+    for raw in text.splitlines():
+        words, keys = clean_line(raw)
+        if words and previous_keys:
+            overlap = _overlap(previous_keys, keys)
+            words, keys = words[overlap:], keys[overlap:]
+        if not words:
+            continue
+        line = " ".join(words)
+        if lines and line.lower() == lines[-1].lower():
+            continue
+        lines.append(line)
+        previous_keys = keys
+    cleaned = len(lines)
+    if target_tokens > 0:
+        lines = fit_budget(lines, target_tokens)
+    output = "\n".join(lines)
+    return CompressionResult(output, estimate_tokens(text), estimate_tokens(output), cleaned - len(lines))
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+_END = object()
+
+
+class HedgePolicy:
+    """When to fire a duplicate Gemini request, and how many duplicates we can afford.
+
+    The hedge delay is a percentile of recent time-to-first-token for the model, so only
+    the slowest calls get a duplicate. Hedges are capped at `budget` of all calls (e.g.
+    0.05 = at most 5% extra requests); the counters in get_stats() keep the extra token
+    cost visible.
+    """
+
+    def __init__(self, percentile: float = 0.0, budget: float = 0.05, min_samples: int = 20, window: int = 200,
+                 min_delay: float = 0.05):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._window = window
+        self._ttft = {}  # model -> deque of recent first-token latencies
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "denied_budget": 0, "denied_rate_limit": 0,
+                      "extra_input_tokens": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.percentile > 0 and self.budget > 0
+
+    def observe_ttft(self, model: str, seconds: float):
+        with self._lock:
+            samples = self._ttft.get(model)
+            if samples is None:
+                samples = self._ttft[model] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def delay(self, model: str) -> Optional[float]:
+        """Seconds to wait for a first token before hedging; None until enough calls were seen."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            samples = sorted(self._ttft.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay, samples[index])
+
+    def record_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+
+    def try_acquire(self, tokens: int, reserve: Callable[[], bool] = lambda: True) -> bool:
+        """Claim a hedge if the budget allows and reserve() (e.g. the rate limiter) agrees."""
+        with self._lock:
+            if self.stats["hedges"] + 1 > self.budget * self.stats["calls"]:
+                self.stats["denied_budget"] += 1
+                return False
+            if not reserve():
+                self.stats["denied_rate_limit"] += 1
+                return False
+            self.stats["hedges"] += 1
+            self.stats["extra_input_tokens"] += tokens
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.stats["hedge_wins"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hedge_rate"] = stats["hedges"] / stats["calls"] if stats["calls"] else 0.0
+        stats["budget"] = self.budget
+        return stats
+
+
+async def _first_success(tasks: list) -> asyncio.Task:
+    """The first task to finish without error (earlier tasks win ties); raises the first error if all fail."""
+    pending, errors = set(tasks), []
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in sorted(done, key=tasks.index):
+            if task.exception() is None:
+                return task
+            errors.append(task.exception())
+    raise errors[0]
+
+
+async def hedged_stream(open_stream: Callable[[], AsyncIterator[str]], delay: Optional[float],
+                        acquire_hedge: Callable[[], bool], on_hedge_won: Callable[[], None] = lambda: None,
+                        started: Optional[asyncio.Event] = None) -> AsyncIterator[str]:
+    """Yield from open_stream(), opening a second copy if no first chunk arrives within `delay`.
+
+    Whichever copy produces its first chunk first is streamed; the other is cancelled.
+    Racing on the first chunk rather than the whole answer suits streaming: stalls happen
+    before the first token, and once text is shown it must all come from one answer.
+    With `started`, the delay counts from when that event is set (the first copy began
+    running) rather than from when it was opened.
+    """
+    streams = [open_stream()]
+    firsts = [asyncio.ensure_future(anext(streams[0], _END))]
+    try:
+        if delay is not None:
+            if started is not None and not started.is_set():
+                waiting = asyncio.ensure_future(started.wait())
+                await asyncio.wait([firsts[0], waiting], return_when=asyncio.FIRST_COMPLETED)
+                waiting.cancel()
+            done, _ = await asyncio.wait(firsts, timeout=delay)
+            if not done and acquire_hedge():
+                streams.append(open_stream())
+                firsts.append(asyncio.ensure_future(anext(streams[1], _END)))
+        winner = await _first_success(firsts)
+        for task in firsts:
+            if task is not winner:
+                task.cancel()
+        if winner is not firsts[0]:
+            on_hedge_won()
+        stream = streams[firsts.index(winner)]
+        first = winner.result()
+        if first is _END:
+            return
+        yield first
+        async for text in stream:
+            yield text
+    finally:
+        for task in firsts:
+            task.cancel()
+        # Let cancelled reads unwind before closing their generators
+        await asyncio.gather(*firsts, return_exceptions=True)
+        for stream in streams:
+            await stream.aclose()
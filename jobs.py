@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from cache import cache_key
+from metrics import Trace, log_trace, record_span, tracing
+from sections import SectionParser
+from utils import CACHE_DIR, REQUEST_LOG_PATH, get_transcript, generate_formats, resolve_models, save_artifacts
+
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+MAX_JOBS_IN_MEMORY = 200
+
+
+class Job:
+    """One generation run. Partial output lives in memory; state and results are persisted."""
+
+    def __init__(self, id: str, key: str, video_id: str, platforms: list, model: str, query: Optional[str], use_cache: bool,
+                 status: str = "queued", results: Optional[dict] = None, errors: Optional[dict] = None, error: Optional[str] = None,
+                 first_token: Optional[float] = None, total: Optional[float] = None, created_at: Optional[float] = None,
+                 trace: Optional[Trace] = None, models: Optional[dict] = None):
+        self.id = id
+        self.key = key
+        self.video_id = video_id
+        self.platforms = platforms
+        self.model = model  # as requested, possibly "auto"
+        self.models = models or {}  # platform -> model actually used, once routed
+        self.query = query
+        self.use_cache = use_cache
+        self.status = status  # queued -> fetching -> generating -> done | failed
+        self.results = results or {}  # platform -> text
+        self.errors = errors or {}  # platform -> message
+        self.error = error  # whole-job failure, e.g. no transcript
+        self.first_token = first_token  # seconds from start to first streamed text
+        self.total = total
+        self.created_at = created_at or time.time()
+        self.partial = {platform: [] for platform in platforms}
+        self.sections = {platform: SectionParser(platform) for platform in platforms}  # parsed as it streams, for display
+        self.trace = trace  # timings and token counts; only kept in memory
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def partial_text(self, platform: str) -> str:
+        return "".join(self.partial.get(platform, ()))
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that ran a job ("host:pid") still exists; jobs from other hosts are assumed alive."""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobManager:
+    """Process-local job queue: runs generations on a background event loop so they outlive Streamlit reruns.
+
+    Identical requests (same video, formats, model, query) that are still in flight share
+    one job, so a second tab or a refreshed page attaches to the run already going.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = MAX_CONCURRENT_JOBS):
+        self._jobs = OrderedDict()  # id -> Job, most recent last
+        self._active = {}  # key -> id of the queued/running job
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_workers)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="job-loop", daemon=True).start()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, video_id TEXT NOT NULL, request TEXT NOT NULL, status TEXT NOT NULL, "
+            "results TEXT, errors TEXT, error TEXT, first_token REAL, total REAL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        if "owner" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        # The app and the HTTP API share this database, each running its own jobs. Jobs whose process
+        # has exited cannot resume; mark them so pages stop waiting on them, and leave live ones alone.
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        for job_id, owner in self._conn.execute("SELECT id, owner FROM jobs WHERE status NOT IN ('done', 'failed')").fetchall():
+            if not _owner_alive(owner):
+                self._conn.execute("UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart' WHERE id = ?",
+                                   (job_id,))
+        self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - JOB_RETENTION_DAYS * 86400,))
+
+    def submit(self, video_id: str, platforms: list, model: str, api_key: str, query: Optional[str] = None, use_cache: bool = True,
+               trace: Optional[Trace] = None, transcript: Optional[str] = None) -> Job:
+        """Start a job, or return the in-flight one for the same request.
+
+        `trace` may already hold spans recorded by the caller, such as parsing the video ID.
+        A `transcript` the caller already has (e.g. prefetched) saves the job fetching it.
+        """
+        key = cache_key("job", video_id, model, query or "", *platforms)
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None and use_cache:
+                return self._jobs[active_id]
+            job = Job(uuid.uuid4().hex, key, video_id, list(platforms), model, query, use_cache, trace=trace or Trace())
+            self._remember(job)
+            self._active[key] = job.id
+        self._save(job)
+        asyncio.run_coroutine_threadsafe(self._run(job, api_key, transcript), self._loop)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        row = self._conn.execute(
+            "SELECT id, key, video_id, request, status, results, errors, error, first_token, total, created_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def find_active(self, video_id: str) -> Optional[Job]:
+        """The newest queued or running job for a video, to attach a new page to."""
+        with self._lock:
+            for job_id in reversed(self._jobs):
+                job = self._jobs[job_id]
+                if job.video_id == video_id and not job.finished:
+                    return job
+        return None
+
+    async def _run(self, job: Job, api_key: str, transcript: Optional[str] = None):
+        with tracing(job.trace):
+            await self._run_traced(job, api_key, transcript)
+        log_trace(job.trace, REQUEST_LOG_PATH, job_id=job.id, video_id=job.video_id, model=job.model, formats=job.platforms,
+                  status=job.status, first_token=job.first_token, total=job.total, error=job.error)
+
+    async def _run_traced(self, job: Job, api_key: str, transcript: Optional[str] = None):
+        async with self._slots:
+            started = time.perf_counter()
+
+            def on_token(platform, text):
+                if text is None:
+                    job.partial[platform] = []
+                    job.sections[platform] = SectionParser(platform)
+                    return
+                if job.first_token is None and text:
+                    job.first_token = time.perf_counter() - started
+                job.partial[platform].append(text)
+                job.sections[platform].feed(text)
+
+            try:
+                if transcript:
+                    job.trace.attrs["transcript_prefetched"] = True
+                else:
+                    self._set_status(job, "fetching")
+                    transcript = await asyncio.to_thread(get_transcript, job.video_id)
+                if not transcript:
+                    job.error = "No video found"
+                else:
+                    job.models = resolve_models(transcript, job.platforms, job.model)
+                    self._set_status(job, "generating")
+                    results = await generate_formats(transcript, job.models, job.platforms, api_key, job.query,
+                                                     use_cache=job.use_cache, on_token=on_token)
+                    for platform, result in results.items():
+                        if isinstance(result, Exception):
+                            job.errors[platform] = str(result)
+                        else:
+                            job.results[platform] = result
+                    save_artifacts(job.video_id, results, job.models, job.query)
+            except asyncio.CancelledError:
+                job.error = "Cancelled"
+                raise
+            except Exception as e:
+                job.error = str(e)
+            finally:
+                job.total = time.perf_counter() - started
+                record_span("total", job.total, job.model, "")
+                job.partial = {platform: [] for platform in job.platforms}
+                job.sections = {}
+                with self._lock:
+                    if self._active.get(job.key) == job.id:
+                        del self._active[job.key]
+                self._set_status(job, "failed" if job.error else "done")
+
+    def _set_status(self, job: Job, status: str):
+        job.status = status
+        self._save(job)
+
+    def _save(self, job: Job):
+        request = json.dumps({"platforms": job.platforms, "model": job.model, "models": job.models, "query": job.query,
+                              "use_cache": job.use_cache})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, key, video_id, request, status, results, errors, error, first_token, total, created_at, updated_at, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.key, job.video_id, request, job.status, json.dumps(job.results), json.dumps(job.errors),
+                 job.error, job.first_token, job.total, job.created_at, time.time(), self._owner),
+            )
+
+    def _remember(self, job: Job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > MAX_JOBS_IN_MEMORY:
+            oldest_id = next(iter(self._jobs))
+            if not self._jobs[oldest_id].finished:
+                break
+            del self._jobs[oldest_id]
+
+    @staticmethod
+    def _from_row(row) -> Job:
+        job_id, key, video_id, request, status, results, errors, error, first_token, total, created_at = row
+        request = json.loads(request)
+        return Job(job_id, key, video_id, request["platforms"], request["model"], request["query"], request["use_cache"],
+                   status=status, results=json.loads(results or "{}"), errors=json.loads(errors or "{}"), error=error,
+                   first_token=first_token, total=total, created_at=created_at, models=request.get("models"))
+
+
+# One manager per process (the Streamlit app or the HTTP API), shared by every session in it
+job_manager = JobManager(os.path.join(CACHE_DIR, "jobs.sqlite3"))
@@ -0,0 +1,218 @@
+import contextlib
+import contextvars
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class MetricsRegistry:
+    """Minimal thread-safe counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._meta = {}  # name -> (type, help, buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str):
+        self._meta[name] = ("counter", help, None)
+
+    def histogram(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self._meta[name] = ("histogram", help, buckets)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._meta[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+        lines = []
+        for name, (kind, help, buckets) in self._meta.items():
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {help}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == "counter":
+                for (series_name, labels), value in counters.items():
+                    if series_name == name:
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+            else:
+                for (series_name, labels), series in histograms.items():
+                    if series_name != name:
+                        continue
+                    for bound, count in zip(buckets, series):
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {count}")
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {series[-2]}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Trace:
+    """Timing spans and token counts for one request (a page generation or a CLI video)."""
+
+    def __init__(self, **attrs):
+        self.id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.attrs = attrs
+        self.spans = []  # {"stage", "seconds", "format", "model"}
+        self.tokens = []  # {"format", "model", "input", "output"}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float, replace: bool = False, **labels):
+        span = {"stage": stage, "seconds": round(seconds, 6), **labels}
+        with self._lock:
+            if replace:
+                self.spans = [s for s in self.spans if (s["stage"], s.get("format"), s.get("model")) != (stage, labels.get("format"), labels.get("model"))]
+            self.spans.append(span)
+
+    def add_tokens(self, input_tokens: int, output_tokens: int, **labels):
+        with self._lock:
+            self.tokens.append({"input": input_tokens, "output": output_tokens, **labels})
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"trace_id": self.id, "started_at": self.started_at, **self.attrs,
+                    "spans": list(self.spans), "tokens": list(self.tokens)}
+
+
+registry = MetricsRegistry(prefix="tutorial_generator_")
+registry.histogram("stage_seconds", "Time spent in each pipeline stage")
+registry.counter("tokens_total", "Gemini tokens by direction, model and format")
+registry.counter("requests_total", "Finished requests by outcome")
+registry.counter("hedges_total", "Duplicate Gemini requests fired for slow calls, by model and event (fired, won)")
+registry.counter("transcript_tokens_total", "Estimated transcript tokens before and after compression, by stage (input, output)")
+
+# The request being served and the format being generated, so deep calls can label what they record
+current_trace = contextvars.ContextVar("current_trace", default=None)
+current_format = contextvars.ContextVar("current_format", default="")
+
+
+@contextlib.contextmanager
+def tracing(trace: Optional[Trace]):
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def format_label(platform: str):
+    token = current_format.set(platform)
+    try:
+        yield
+    finally:
+        current_format.reset(token)
+
+
+def record_span(stage: str, seconds: float, model: str = "", format: Optional[str] = None, trace: Optional[Trace] = None, replace: bool = False):
+    format = current_format.get() if format is None else format
+    registry.observe("stage_seconds", seconds, stage=stage, model=model, format=format)
+    trace = trace or current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, seconds, replace=replace, model=model, format=format)
+
+
+@contextlib.contextmanager
+def span(stage: str, model: str = "", format: Optional[str] = None):
+    """Time a block as one pipeline stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started, model, format)
+
+
+def record_tokens(model: str, input_tokens: int, output_tokens: int, format: Optional[str] = None):
+    format = current_format.get() if format is None else format
+    registry.inc("tokens_total", input_tokens, direction="input", model=model, format=format)
+    registry.inc("tokens_total", output_tokens, direction="output", model=model, format=format)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_tokens(input_tokens, output_tokens, model=model, format=format)
+
+
+def record_compression(input_tokens: int, output_tokens: int, dropped_lines: int = 0):
+    """Count a transcript compression and note its ratio on the current request's trace."""
+    registry.inc("transcript_tokens_total", input_tokens, stage="input")
+    registry.inc("transcript_tokens_total", output_tokens, stage="output")
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attrs["compression"] = {"input_tokens": input_tokens, "output_tokens": output_tokens, "dropped_lines": dropped_lines,
+                                      "ratio": round(output_tokens / input_tokens, 3) if input_tokens else 1.0}
+
+
+def log_trace(trace: Trace, path: Optional[str] = None, **attrs):
+    """Write the request as one JSON line, to path or stdout."""
+    trace.attrs.update(attrs)
+    registry.inc("requests_total", status=trace.attrs.get("status", ""))
+    line = json.dumps(trace.to_dict(), ensure_ascii=False)
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    else:
+        print(line)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve registry.render() at /metrics on a background thread; safe to call more than once."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
@@ -0,0 +1,79 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))  # shared by all sessions; 0 disables prefetching
+PREFETCH_PER_SESSION = int(os.getenv("PREFETCH_PER_SESSION", "3"))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch") if PREFETCH_WORKERS > 0 else None
+
+
+class TranscriptPrefetcher:
+    """One session's speculative transcript fetches: a small LRU of video ID -> Future.
+
+    prefetch() starts fetching the video the user has just entered, before they press
+    Generate, and cancels queued fetches for videos they have since moved away from. A
+    fetch that is already running cannot be interrupted; it finishes and warms the
+    shared transcript cache instead. get() hands over a finished transcript, so the job
+    can skip the fetch.
+    """
+
+    def __init__(self, fetch: Callable[[str], str], limit: int = PREFETCH_PER_SESSION, executor: Optional[ThreadPoolExecutor] = None):
+        self._fetch = fetch
+        self._limit = limit
+        self._executor = executor or _executor
+        self._futures = OrderedDict()  # video_id -> Future, most recent last
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "cancelled": 0, "hits": 0, "misses": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None and self._limit > 0
+
+    @staticmethod
+    def _usable(future: Future) -> bool:
+        """Still running, or finished with a transcript (failures and cancellations are retried)."""
+        if not future.done():
+            return True
+        return not future.cancelled() and future.exception() is None and bool(future.result())
+
+    def prefetch(self, video_id: str) -> Optional[Future]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            future = self._futures.get(video_id)
+            if future is not None and self._usable(future):
+                self._futures.move_to_end(video_id)
+                return future
+            # The user has moved on to this video, so queued fetches for others are abandoned
+            for other, pending in list(self._futures.items()):
+                if pending.cancel():
+                    del self._futures[other]
+                    self.stats["cancelled"] += 1
+            future = self._executor.submit(self._fetch, video_id)
+            self._futures[video_id] = future
+            self.stats["started"] += 1
+            while len(self._futures) > self._limit:
+                _, evicted = self._futures.popitem(last=False)
+                if evicted.cancel():
+                    self.stats["cancelled"] += 1
+            return future
+
+    def ready(self, video_id: str) -> bool:
+        with self._lock:
+            future = self._futures.get(video_id)
+        return future is not None and future.done() and self._usable(future)
+
+    def get(self, video_id: str) -> Optional[str]:
+        """The prefetched transcript if it has arrived, else None and the caller fetches it as usual."""
+        with self._lock:
+            future = self._futures.get(video_id)
+            hit = future is not None and future.done() and self._usable(future)
+            self.stats["hits" if hit else "misses"] += 1
+        return future.result() if hit else None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "stored": len(self._futures)}
@@ -1,15 +1,74 @@
-from typing import Optional
+import functools
+import hashlib
+import re
+import string
+from typing import Optional, Union
 
+from chunking import estimate_tokens
 
-def build_social_media_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> str:
-    query_instruction = f"\n\nNote from user: {user_query}" if user_query else ""
-    return f"""
-You are a world-class {platform} content strategist and viral copywriter.
 
-Your mission: Transform the provided transcript into ONE scroll-stopping post optimized for {platform}, using the process below.
+class PromptTemplate:
+    """Static prompt text with {field} placeholders, parsed once at import.
+
+    render() only joins the literal segments with the values.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._segments = tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(text))
+
+    def render(self, **values) -> str:
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in self._segments)
+
+
+class Prompt:
+    """An assembled prompt kept as its pieces, so the transcript is referenced rather than copied.
+
+    Gemini takes the pieces as the text parts of one message, so a prompt never has to
+    be joined to be sent; str() joins it when a single string is really needed.
+    Prompts concatenate with + (with each other or with strings).
+    """
+
+    __slots__ = ("parts", "estimated_tokens")
+
+    def __init__(self, *parts: str):
+        self.parts = tuple(part for part in parts if part)
+        self.estimated_tokens = sum(estimate_tokens(part) for part in self.parts)
+
+    def __add__(self, other: Union["Prompt", str]) -> "Prompt":
+        return Prompt(*self.parts, *(other.parts if isinstance(other, Prompt) else (other,)))
+
+    def __radd__(self, other: str) -> "Prompt":
+        return Prompt(other, *self.parts)
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def __str__(self) -> str:
+        return "".join(self.parts)
+
+    def __repr__(self) -> str:
+        return f"Prompt({len(self.parts)} parts, ~{self.estimated_tokens} tokens)"
+
+
+def estimate_prompt_tokens(prompt: Union[Prompt, str]) -> int:
+    """Token estimate for budgeting before sending; free for a Prompt, whose count is precomputed."""
+    return prompt.estimated_tokens if isinstance(prompt, Prompt) else estimate_tokens(prompt)
+
 
-TRANSCRIPT:
-{video_transcript}
+TRANSCRIPT_HEADER = "\nTRANSCRIPT:\n"
+TRANSCRIPT_FOOTER = "\n\n---\n"
+
+
+def build_transcript_context(video_transcript: str) -> Prompt:
+    """Leading context block shared by every format, so one upload/cache entry serves them all."""
+    return Prompt(TRANSCRIPT_HEADER, video_transcript, TRANSCRIPT_FOOTER)
+
+
+SOCIAL_MEDIA_INSTRUCTIONS = PromptTemplate("""
+You are a world-class {platform} content strategist and viral copywriter.
+
+Your mission: Transform the transcript above into ONE scroll-stopping post optimized for {platform}, using the process below.
 {query_instruction}
 
 ---
@@ -89,19 +148,21 @@ Output must contain only ONE Final Post, ONE Summary, and ONE Blog paragraph. Do
 
 Do NOT include any explanations, scores, or formatting other than the three required fields above.
 
-"""
+""")
+
+
+def build_social_media_instructions(platform: str, user_query: Optional[str] = None) -> str:
+    query_instruction = f"\n\nNote from user: {user_query}" if user_query else ""
+    return SOCIAL_MEDIA_INSTRUCTIONS.render(platform=platform, query_instruction=query_instruction)
 # Only return the final best post. No explanations. No scoring. No extra formatting.
 
-def build_tutorial_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> str:
-    query_instruction = f"\n\nAdditional note from user: {user_query}" if user_query else ""
+def build_social_media_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> Prompt:
+    return build_transcript_context(video_transcript) + build_social_media_instructions(platform, user_query)
 
-    return f"""
+TUTORIAL_INSTRUCTIONS = PromptTemplate("""
 You are a **world-class technical writer** and **developer educator**.
-Your task is to transform the transcript below into a **step-by-step, code-accurate developer tutorial**.
+Your task is to transform the transcript above into a **step-by-step, code-accurate developer tutorial**.
 The tutorial must follow the **exact sequence, details, and technical accuracy** of the transcript — NO deviations.
-
-TRANSCRIPT:
-{video_transcript}
 {query_instruction}
 
 ---
@@ -187,14 +248,18 @@ Only output the **final, validated tutorial** in Markdown — no drafts, no scor
 
 **FINAL OBJECTIVE:**  
 Produce a **clear, technically correct, platform-ready Markdown tutorial** that perfectly mirrors the transcript, with zero hallucinations or omissions.
-"""
+""")
 
-def build_merged_summary_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> str:
-    query_instruction = f"\n\nCustom Instruction:\n{user_query}" if user_query else ""
-    platform="Educational"
 
-    return f"""
-You are a professional summarizer and content strategist. Your goal is to extract a human-sounding summary and specific takeaways from the following YouTube video transcript, suitable for publication on {platform} (e.g., blog, newsletter, educational recap).
+def build_tutorial_instructions(platform: str, user_query: Optional[str] = None) -> str:
+    query_instruction = f"\n\nAdditional note from user: {user_query}" if user_query else ""
+    return TUTORIAL_INSTRUCTIONS.render(platform=platform, query_instruction=query_instruction)
+
+def build_tutorial_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> Prompt:
+    return build_transcript_context(video_transcript) + build_tutorial_instructions(platform, user_query)
+
+MERGED_SUMMARY_INSTRUCTIONS = PromptTemplate("""
+You are a professional summarizer and content strategist. Your goal is to extract a human-sounding summary and specific takeaways from the YouTube video transcript above, suitable for publication on {platform} (e.g., blog, newsletter, educational recap).
 
 ---
 
@@ -268,20 +333,21 @@ You are a professional summarizer and content strategist. Your goal is to extrac
   Note: API error; limited output generated.
 
 ---
-
-### TRANSCRIPT:
-{video_transcript}
-
 {query_instruction}
+""")
 
----
-"""
 
-def build_note_taking_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> str:
+def build_merged_summary_instructions(platform: str, user_query: Optional[str] = None) -> str:
     query_instruction = f"\n\nCustom Instruction:\n{user_query}" if user_query else ""
+    platform="Educational"
+
+    return MERGED_SUMMARY_INSTRUCTIONS.render(platform=platform, query_instruction=query_instruction)
 
-    return f"""
-You are an expert human note-taker tasked with creating **comprehensive, structured, and natural-sounding notes** based on the provided YouTube transcript. Imagine you are **watching the video live** and writing high-quality notes in real time for personal learning, review, or professional publication on {platform} (e.g., personal notes, blog, educational recap).
+def build_merged_summary_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> Prompt:
+    return build_transcript_context(video_transcript) + build_merged_summary_instructions(platform, user_query)
+
+NOTE_TAKING_INSTRUCTIONS = PromptTemplate("""
+You are an expert human note-taker tasked with creating **comprehensive, structured, and natural-sounding notes** based on the YouTube transcript above. Imagine you are **watching the video live** and writing high-quality notes in real time for personal learning, review, or professional publication on {platform} (e.g., personal notes, blog, educational recap).
 
 Your output should be in **clean Markdown format** for direct use in blogs, knowledge bases, or Markdown-compatible platforms, avoiding artifacts like `**` around headers.
 
@@ -428,11 +494,155 @@ The speaker recaps the importance of balancing self-awareness with a support sys
 ```
 
 ---
+{query_instruction}
+""")
 
-### TRANSCRIPT:
-{video_transcript}
 
+def build_note_taking_instructions(platform: str, user_query: Optional[str] = None) -> str:
+    query_instruction = f"\n\nCustom Instruction:\n{user_query}" if user_query else ""
+    return NOTE_TAKING_INSTRUCTIONS.render(platform=platform, query_instruction=query_instruction)
+
+def build_note_taking_prompt(video_transcript: str, platform: str, user_query: Optional[str] = None) -> Prompt:
+    return build_transcript_context(video_transcript) + build_note_taking_instructions(platform, user_query)
+
+
+CHUNK_MAP_FOCUS = {
+    "tutorial blog": """- Every step, action and instruction, in the exact order given.
+- All code, commands, file names and configuration values, copied exactly in code blocks.
+- Tools, libraries and versions mentioned, and the outcome of each step.""",
+    "summary": """- The main topic and purpose of this section.
+- Every distinct fact, claim, number or recommendation, 1–2 lines each.""",
+    "note taking": """- Every distinct idea, transition and example, in order.
+- Quotes, definitions and any code or commands, preserved exactly.
+- Where the topic shifts, start a new `###` subheading.""",
+}
+
+
+CHUNK_MAP_INSTRUCTIONS = PromptTemplate("""
+You are extracting source material from part {part} of {total} of a long transcript. Another pass will merge all parts into a final {platform}.
+
+Extract, as terse Markdown bullet points:
+{focus}
+
+Rules:
+- Use only what is explicitly said in this part. Do not invent, infer or summarize away detail.
+- Do not write an introduction or conclusion, and do not mention parts, transcripts or videos.
+- The start of this part may repeat the end of the previous one; extract it anyway.
 {query_instruction}
 
----
+TRANSCRIPT PART {part}/{total}:
+""")
+
+
+def build_chunk_map_prompt(chunk: str, platform: str, part: int, total: int, user_query: Optional[str] = None) -> Prompt:
+    """Map step of chunked generation: extract raw material from one transcript window."""
+    query_instruction = f"\n\nUser instruction for the final output (keep relevant material for it):\n{user_query}" if user_query else ""
+    focus = CHUNK_MAP_FOCUS.get(platform.lower(), CHUNK_MAP_FOCUS["summary"])
+    instructions = CHUNK_MAP_INSTRUCTIONS.render(part=part, total=total, platform=platform, focus=focus, query_instruction=query_instruction)
+    return Prompt(instructions, chunk, "\n")
+
+
+def merge_chunk_extracts(extracts: list) -> str:
+    """Join map-step outputs into the condensed transcript used by the reduce step."""
+    total = len(extracts)
+    return "\n\n".join(f"[Part {i}/{total}]\n{extract.strip()}" for i, extract in enumerate(extracts, start=1))
+
+
+@functools.lru_cache(maxsize=256)
+def build_format_instructions(platform: str, user_query: Optional[str] = None) -> str:
+    """Format-specific instructions that follow the shared transcript context.
+
+    Rendered once per (platform, query) and reused, so every request, preview and cache
+    key for a format shares the same string.
+    """
+    if platform.lower() == "tutorial blog":
+        return build_tutorial_instructions(platform, user_query)
+    elif platform.lower() == "summary":
+        return build_merged_summary_instructions(platform, user_query)
+    elif platform.lower() == "note taking":
+        return build_note_taking_instructions(platform, user_query)
+    return build_social_media_instructions(platform, user_query)
+
+
+# Changes whenever the wording of any prompt does, so stored outputs record which prompts produced them
+PROMPT_VERSION = hashlib.sha256("\x00".join([
+    TRANSCRIPT_HEADER, TRANSCRIPT_FOOTER, *CHUNK_MAP_FOCUS.values(),
+    *(template.text for template in (SOCIAL_MEDIA_INSTRUCTIONS, TUTORIAL_INSTRUCTIONS, MERGED_SUMMARY_INSTRUCTIONS,
+                                     NOTE_TAKING_INSTRUCTIONS, CHUNK_MAP_INSTRUCTIONS)),
+]).encode("utf-8")).hexdigest()[:12]
+
+
+FORMAT_MARKER = "<<<FORMAT: {platform}>>>"
+FORMAT_MARKER_PATTERN = r"^[ \t]*<<<FORMAT:\s*(.+?)\s*>>>[ \t]*$"
+
+
+def build_multi_format_prompt(video_transcript: str, platforms: list, user_query: Optional[str] = None) -> Prompt:
+    """One request for several formats: the transcript once, then each format's task."""
+    markers = "\n".join(FORMAT_MARKER.format(platform=platform) for platform in platforms)
+    tasks = "\n\n".join(
+        f"=== TASK {i}: {platform} ===\n{build_format_instructions(platform, user_query)}"
+        for i, platform in enumerate(platforms, start=1)
+    )
+    return build_transcript_context(video_transcript) + f"""
+You will complete {len(platforms)} independent tasks on the transcript above. Treat each task as if it were the only one: follow its own rules and output format in full, and do not let one task's output shorten or reference another.
+
+Start the output of each task with its marker on a line of its own, in this order, and write nothing outside the marked sections:
+{markers}
+
+{tasks}
 """
+
+
+def split_multi_format_output(text: str, platforms: list) -> dict:
+    """Split a combined response back into {platform: output}; missing sections are left out."""
+    wanted = {platform.lower(): platform for platform in platforms}
+    sections = {}
+    matches = list(re.finditer(FORMAT_MARKER_PATTERN, text, re.MULTILINE))
+    for i, match in enumerate(matches):
+        platform = wanted.get(match.group(1).lower())
+        if platform is None or platform in sections:
+            continue
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        section = text[match.end():end].strip()
+        if section:
+            sections[platform] = section
+    return sections
+
+
+class MultiFormatDemux:
+    """Incrementally route a streamed combined response to its formats.
+
+    feed() returns (platform, text) pieces as soon as they are known not to be part
+    of a marker line; text before the first marker is dropped.
+    """
+
+    def __init__(self, platforms: list):
+        self._wanted = {platform.lower(): platform for platform in platforms}
+        self._current = None
+        self._line = ""
+
+    def feed(self, text: str) -> list:
+        pieces = []
+        self._line += text
+        while "\n" in self._line:
+            line, self._line = self._line.split("\n", 1)
+            self._route(line + "\n", pieces)
+        # A partial line can be shown right away unless it may still turn into a marker
+        if self._line and not "<<<FORMAT:".startswith(self._line.lstrip()[:10]):
+            self._route(self._line, pieces)
+            self._line = ""
+        return pieces
+
+    def flush(self) -> list:
+        pieces = []
+        if self._line:
+            self._route(self._line, pieces)
+            self._line = ""
+        return pieces
+
+    def _route(self, text: str, pieces: list):
+        match = re.match(FORMAT_MARKER_PATTERN, text.rstrip("\n"))
+        if match:
+            self._current = self._wanted.get(match.group(1).lower())
+        elif self._current is not None:
+            pieces.append((self._current, text))
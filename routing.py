@@ -0,0 +1,101 @@
+import threading
+from typing import Optional
+
+AUTO_MODEL = "auto"
+MODELS = ["gemini-2.5-flash", "gemini-2.5-flash-lite"]  # most capable first
+LITE_MODEL = "gemini-2.5-flash-lite"
+FULL_MODEL = "gemini-2.5-flash"
+
+# USD per 1M tokens (input, output), for the optional cost cap
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+EXPECTED_OUTPUT_TOKENS = 2000
+
+# Upper bounds (estimated prompt tokens) of the size buckets latencies are tracked in
+SIZE_BUCKETS = [(8_000, "small"), (32_000, "medium"), (128_000, "large")]
+LARGEST_BUCKET = "huge"
+
+# Formats whose output is short and formulaic enough for the lite model on short videos
+LIGHT_FORMATS = {"Summary", "Note Taking", "Twitter", "Facebook", "Instagram", "LinkedIn"}
+
+
+def size_bucket(tokens: int) -> str:
+    for limit, name in SIZE_BUCKETS:
+        if tokens < limit:
+            return name
+    return LARGEST_BUCKET
+
+
+class ModelRouter:
+    """Pick a Gemini model per format and transcript size, then adapt to observed latency.
+
+    The base policy sends light formats on small transcripts to flash-lite, long-form
+    tutorials to flash, and very long transcripts to flash-lite, whose shorter generation
+    time keeps them from timing out. With a latency SLO, a model whose recent latency for
+    that size bucket exceeds it is swapped for one that meets it (or, failing that, the
+    fastest observed). With a cost cap, models whose estimated cost per call exceeds it
+    are skipped.
+
+    Latency is an exponentially weighted moving average per (model, size bucket), fed by
+    observe() after every successful generation.
+    """
+
+    def __init__(self, latency_slo: float = 0.0, max_cost: float = 0.0, min_samples: int = 3, smoothing: float = 0.3):
+        self.latency_slo = latency_slo
+        self.max_cost = max_cost
+        self.min_samples = min_samples
+        self.smoothing = smoothing
+        self._latency = {}  # (model, bucket) -> [ewma seconds, samples]
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, prompt_tokens: int, seconds: float):
+        key = (model, size_bucket(prompt_tokens))
+        with self._lock:
+            entry = self._latency.get(key)
+            if entry is None:
+                self._latency[key] = [seconds, 1]
+            else:
+                entry[0] += self.smoothing * (seconds - entry[0])
+                entry[1] += 1
+
+    def expected_latency(self, model: str, bucket: str) -> Optional[float]:
+        """Smoothed latency, or None until min_samples calls have been seen."""
+        with self._lock:
+            entry = self._latency.get((model, bucket))
+        return entry[0] if entry and entry[1] >= self.min_samples else None
+
+    @staticmethod
+    def estimated_cost(model: str, prompt_tokens: int) -> float:
+        price_in, price_out = MODEL_PRICES.get(model, MODEL_PRICES[FULL_MODEL])
+        return (prompt_tokens * price_in + EXPECTED_OUTPUT_TOKENS * price_out) / 1_000_000
+
+    def base_model(self, platform: str, bucket: str) -> str:
+        if bucket == LARGEST_BUCKET:
+            return LITE_MODEL
+        if platform in LIGHT_FORMATS and bucket == "small":
+            return LITE_MODEL
+        return FULL_MODEL
+
+    def route(self, platform: str, prompt_tokens: int) -> str:
+        bucket = size_bucket(prompt_tokens)
+        choice = self.base_model(platform, bucket)
+        # The policy's choice first; the cost cap and the SLO only move away from it when they must
+        candidates = [choice] + [model for model in MODELS if model != choice]
+        if self.max_cost > 0:
+            affordable = [model for model in candidates if self.estimated_cost(model, prompt_tokens) <= self.max_cost]
+            candidates = affordable or [min(candidates, key=lambda model: self.estimated_cost(model, prompt_tokens))]
+        if self.latency_slo > 0:
+            for model in candidates:
+                latency = self.expected_latency(model, bucket)
+                # Unmeasured models get tried, which is also how the router learns about them
+                if latency is None or latency <= self.latency_slo:
+                    return model
+            return min(candidates, key=lambda model: self.expected_latency(model, bucket))
+        return candidates[0]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {f"{model}/{bucket}": {"latency_ewma": round(ewma, 3), "samples": samples}
+                    for (model, bucket), (ewma, samples) in self._latency.items()}
@@ -0,0 +1,153 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so callers wait in arrival order.
+
+    reserve() always succeeds and returns how long the caller must wait before using
+    what it reserved; the level may go negative, which is what queues later callers.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self._level -= amount
+        return max(0.0, -self._level / self.rate)
+
+    def available(self, amount: float, now: float) -> bool:
+        self._refill(now)
+        return self._level >= amount
+
+
+class RequestScheduler:
+    """Central gate for Gemini calls: per-(key, model) RPM/TPM budgets, queueing and retries.
+
+    Gemini quotas are per project and model, so each (api_key, model) pair gets its own
+    request and token buckets. Work over budget waits for its reservation instead of
+    failing, and transient errors are retried with full-jitter exponential backoff.
+
+    State is guarded by a threading lock rather than asyncio primitives because Streamlit
+    runs each session's event loop on its own thread.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 32.0,
+                 is_retryable: Callable[[BaseException], bool] = lambda e: getattr(e, "retryable", False)):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_retryable = is_retryable
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "scheduled": 0, "completed": 0, "failed": 0, "retries": 0,
+            "queued": 0, "queue_depth": 0, "max_queue_depth": 0,
+            "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+        }
+
+    def _get_buckets(self, api_key: str, model: str) -> tuple:
+        buckets = self._buckets.get((api_key, model))
+        if buckets is None:
+            buckets = (
+                TokenBucket(self.requests_per_minute) if self.requests_per_minute > 0 else None,
+                TokenBucket(self.tokens_per_minute) if self.tokens_per_minute > 0 else None,
+            )
+            self._buckets[(api_key, model)] = buckets
+        return buckets
+
+    def _reserve(self, api_key: str, model: str, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; returns the seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            requests, token_budget = self._get_buckets(api_key, model)
+            wait = 0.0
+            if requests:
+                wait = max(wait, requests.reserve(1, now))
+            if token_budget:
+                wait = max(wait, token_budget.reserve(tokens, now))
+            return wait
+
+    def try_reserve(self, api_key: str, model: str, tokens: int) -> bool:
+        """Reserve one request and `tokens` tokens only if that needs no waiting, e.g. for optional extra calls."""
+        now = time.monotonic()
+        with self._lock:
+            requests, token_budget = self._get_buckets(api_key, model)
+            if (requests and not requests.available(1, now)) or (token_budget and not token_budget.available(tokens, now)):
+                return False
+            if requests:
+                requests.reserve(1, now)
+            if token_budget:
+                token_budget.reserve(tokens, now)
+            return True
+
+    def _record_wait(self, wait: float):
+        with self._lock:
+            self.stats["wait_seconds_total"] += wait
+            self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], wait)
+
+    def _queue(self, delta: int):
+        with self._lock:
+            self.stats["queue_depth"] += delta
+            if delta > 0:
+                self.stats["queued"] += 1
+                self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.stats["queue_depth"])
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, api_key: str, model: str, tokens: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call() once its budget allows, retrying transient failures."""
+        self._count("scheduled")
+        attempt = 0
+        while True:
+            wait = self._reserve(api_key, model, tokens)
+            if wait > 0:
+                self._queue(1)
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._queue(-1)
+            self._record_wait(wait)
+            try:
+                result = await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    self._count("failed")
+                    raise
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                self._count("retries")
+                print(f"[Scheduler] Retry {attempt}/{self.max_retries} for {model} in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            self._count("completed")
+            return result
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        finished = stats["completed"] + stats["failed"]
+        attempts = finished + stats["retries"]
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / attempts if attempts else 0.0
+        return stats
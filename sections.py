@@ -0,0 +1,204 @@
+"""Split generated output into the sections each format asks for.
+
+Summaries have "Summary:" then "Key Takeaways:", notes have "Summary" then "Main Notes",
+and social posts have "Final Post:", "Summary:" and "Blog:" fields. SectionParser reads
+the output once, chunk by chunk as it streams, and reports each section as soon as the
+header after it has been seen, so parse time is linear in the length of the output.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# A header only counts once this much text follows it (or the output ends), so a header
+# split across streamed chunks, or its trailing colon, is never cut in two
+HEADER_LOOKAHEAD = 64
+
+# Whitespace between a header word and its colon is bounded so that a header match has a bounded length
+SEQUENTIAL_FORMATS = {
+    "summary": [("summary", r"summary\s{0,16}:"), ("takeaways", r"key takeaways\s{0,16}:")],
+    "note taking": [("summary", r"summary(?:\s{0,16}:)?"), ("notes", r"main notes(?:\s{0,16}:)?")],
+}
+POST_FIELDS = [("final_post", r"Final Post:", "line"), ("summary", r"Summary:", "line"), ("blog", r"Blog:", "rest")]
+
+SECTION_TITLES = {"final_post": "Final Post", "summary": "Summary", "takeaways": "Key Takeaways", "notes": "Main Notes", "blog": "Blog"}
+NO_TAKEAWAYS = "No key takeaways extracted due to formatting issues."
+NO_NOTES = "No key notes extracted due to formatting issues."
+
+
+class _HeaderScanner:
+    """Find the first match of a header in a stream, holding back only a short tail between chunks."""
+
+    def __init__(self, pattern: "re.Pattern"):
+        self.pattern = pattern
+        self._tail = ""
+
+    def feed(self, text: str, final: bool = False) -> Tuple[str, Optional[str]]:
+        """(text before the header, text after it); the second is None until the header has been seen."""
+        window = self._tail + text
+        match = self.pattern.search(window)
+        if match and (final or len(window) - match.end() >= HEADER_LOOKAHEAD):
+            self._tail = ""
+            return window[:match.start()], window[match.end():]
+        cut = len(window) if final else max(0, len(window) - HEADER_LOOKAHEAD)
+        if match:
+            cut = min(cut, match.start())
+        self._tail = window[cut:]
+        return window[:cut], None
+
+
+class _Sequence:
+    """Sections that follow one another: each runs until the next header, and all headers must appear."""
+
+    def __init__(self, headers: List[Tuple[str, str]]):
+        self._headers = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in headers]
+        self._found = 0
+        self._scanner = _HeaderScanner(self._headers[0][1])
+        self._current = None
+        self._parts = []
+
+    @property
+    def complete(self) -> bool:
+        return self._found == len(self._headers)
+
+    def feed(self, text: str, final: bool = False) -> List[Tuple[str, str]]:
+        closed = []
+        while True:
+            if self._scanner is None:
+                self._parts.append(text)
+                break
+            before, after = self._scanner.feed(text, final)
+            if self._current is not None:
+                self._parts.append(before)
+            if after is None:
+                break
+            if self._current is not None:
+                closed.append((self._current, "".join(self._parts)))
+            self._current = self._headers[self._found][0]
+            self._found += 1
+            self._parts = []
+            self._scanner = _HeaderScanner(self._headers[self._found][1]) if not self.complete else None
+            text = after
+        if final and self.complete:
+            closed.append((self._current, "".join(self._parts)))
+        return closed
+
+    def in_progress(self) -> Optional[Tuple[str, str]]:
+        return (self._current, "".join(self._parts)) if self._current is not None else None
+
+
+class _Field:
+    """One independent header and either the rest of its line ("line") or everything after it ("rest")."""
+
+    def __init__(self, name: str, pattern: str, extent: str):
+        self.name = name
+        self.extent = extent
+        self.done = False
+        self._scanner = _HeaderScanner(re.compile(pattern))
+        self._parts = None  # None until the header is seen
+
+    def feed(self, text: str, final: bool = False) -> Optional[str]:
+        """The field's text once it is complete, else None."""
+        if self.done:
+            return None
+        if self._parts is None:
+            _, text = self._scanner.feed(text, final)
+            if text is None:
+                return None
+            self._parts = []
+        if self.extent == "line":
+            if not self._parts:
+                text = text.lstrip()  # the line starts at the first non-blank character, even on a later line
+            newline = text.find("\n")
+            if newline >= 0:
+                self._parts.append(text[:newline])
+                self.done = True
+                return "".join(self._parts)
+        if text:
+            self._parts.append(text)
+        if final:
+            self.done = True
+            return "".join(self._parts)
+        return None
+
+    def in_progress(self) -> Optional[Tuple[str, str]]:
+        return (self.name, "".join(self._parts)) if self._parts is not None and not self.done else None
+
+
+def _trim_header_line(text: str) -> str:
+    """Drop the markdown that opened the next header ("## ", "**") from the end of a section."""
+    line_start = text.rfind("\n") + 1
+    if not text[line_start:].strip("#* \t"):
+        return text[:line_start]
+    return text
+
+
+class SectionParser:
+    """Incrementally split one format's output into named sections.
+
+    feed() takes streamed chunks and returns the sections they closed; `completed` holds
+    every closed section so far. close() returns all sections, falling back to the whole
+    output where headers are missing: the summary or blog is then the full text.
+    """
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self._kind = platform.lower()
+        self._chunks = []
+        self._closed = False
+        self.completed = {}
+        if self._kind in SEQUENTIAL_FORMATS:
+            self._sequence = _Sequence(SEQUENTIAL_FORMATS[self._kind])
+            self._fields = []
+        else:
+            self._sequence = None
+            self._fields = [_Field(name, pattern, extent) for name, pattern, extent in POST_FIELDS]
+
+    def _clean(self, text: str) -> str:
+        text = _trim_header_line(text).strip()
+        if text.startswith("**"):
+            text = text[2:].lstrip()  # closing bold of a "**Summary:**" header
+        if self._kind == "note taking":
+            text = text.replace("**", "")
+        return text
+
+    def _feed(self, text: str, final: bool) -> Dict[str, str]:
+        self._chunks.append(text)
+        if self._sequence is not None:
+            closed = self._sequence.feed(text, final)
+        else:
+            closed = [(field.name, field.feed(text, final)) for field in self._fields]
+        closed = {name: self._clean(section) for name, section in closed if section is not None}
+        self.completed.update(closed)
+        return closed
+
+    def feed(self, text: str) -> Dict[str, str]:
+        """Add a streamed chunk; returns {section: text} for the sections it completed."""
+        return self._feed(text, final=False)
+
+    def in_progress(self) -> Optional[Tuple[str, str]]:
+        """The section currently being written and its text so far, for live display."""
+        if self._sequence is not None:
+            return self._sequence.in_progress()
+        return next((state for state in (field.in_progress() for field in self._fields) if state), None)
+
+    def close(self) -> Dict[str, str]:
+        """Finish the output and return every section, with fallbacks for missing headers."""
+        if not self._closed:
+            self._feed("", final=True)
+            self._closed = True
+        sections = dict(self.completed)
+        if self._kind == "summary" and not self._sequence.complete:
+            return {"summary": "".join(self._chunks).strip(), "takeaways": NO_TAKEAWAYS}
+        if self._kind == "note taking" and not self._sequence.complete:
+            return {"summary": "".join(self._chunks).strip(), "notes": NO_NOTES}
+        if self._sequence is None:
+            sections.setdefault("final_post", "")
+            sections.setdefault("summary", "")
+            sections.setdefault("blog", "".join(self._chunks).strip())
+        return sections
+
+
+def parse_sections(platform: str, content: str) -> Dict[str, str]:
+    """Parse a complete output in one go."""
+    parser = SectionParser(platform)
+    parser.feed(content)
+    return parser.close()
@@ -0,0 +1,335 @@
+"""HTTP API for other services: transcripts, generation (whole or streamed) and background jobs.
+
+Usage:
+    python server.py --port 8080
+
+Endpoints:
+    GET  /v1/transcripts/{video}   transcript text for a video URL or ID
+    POST /v1/generate              generate formats and return them when done
+    POST /v1/generate/stream       the same, streamed as server-sent events
+    POST /v1/jobs                  start a background job (202), shared with the Streamlit app
+    GET  /v1/jobs/{id}             job status, partial output while running, results when done
+    GET  /v1/outputs/{video}       every output generated for a video before, newest first
+    GET  /v1/outputs?q=...         full-text search over past outputs (optional format=, limit=)
+    GET  /metrics                  Prometheus metrics
+    GET  /healthz
+
+Generation requests take JSON: {"video": URL or ID, "formats": [...], "model": "auto",
+"query": null, "regenerate": false}. Runs on one asyncio loop with the pipeline in
+utils, so Gemini clients, caches, request coalescing and the rate limiter are shared
+with every request. Anything that blocks (SQLite, the request log, compression) runs on a
+worker thread so open streams never stall behind it. Generations beyond
+API_MAX_CONCURRENT_REQUESTS wait, and once API_MAX_QUEUED_REQUESTS are waiting, new ones
+get a 503 with Retry-After.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from jobs import job_manager
+from metrics import Trace, log_trace, registry, tracing
+from routing import AUTO_MODEL
+from sections import parse_sections
+from utils import (REQUEST_LOG_PATH, VALID_PLATFORMS, generate_formats, get_available_models, get_saved_outputs, get_transcript,
+                   parse_video_id, preload_dependencies, resolve_models, save_artifacts, search_saved_outputs)
+
+API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "16"))  # generations running at once
+API_MAX_QUEUED_REQUESTS = int(os.getenv("API_MAX_QUEUED_REQUESTS", "64"))  # waiting for a slot before new ones are refused
+API_TRANSCRIPT_WORKERS = int(os.getenv("API_TRANSCRIPT_WORKERS", "8"))  # concurrent transcript fetches
+API_TOKEN = os.getenv("API_TOKEN")  # if set, requests need "Authorization: Bearer <token>"
+DEFAULT_FORMATS = ["Tutorial Blog", "Summary", "Note Taking"]
+
+registry.counter("api_requests_total", "API requests by route and HTTP status")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimit:
+    """At most `limit` holders at once and at most `max_waiting` queued behind them; beyond that acquire() fails fast."""
+
+    def __init__(self, limit: int, max_waiting: int):
+        self._slots = asyncio.Semaphore(limit)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.running = 0
+        self.stats = {"admitted": 0, "rejected": 0}
+
+    async def __aenter__(self):
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.stats["rejected"] += 1
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.stats["admitted"] += 1
+        self.running += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.running -= 1
+        self._slots.release()
+
+
+def _error(status: int, message: str, **headers) -> web.Response:
+    return web.json_response({"error": message}, status=status, headers=headers or None)
+
+
+@web.middleware
+async def api_middleware(request: web.Request, handler):
+    route = request.match_info.route.resource.canonical if request.match_info.route.resource else "unmatched"
+    if API_TOKEN and request.path.startswith("/v1/") and request.headers.get("Authorization") != f"Bearer {API_TOKEN}":
+        response = _error(401, "Missing or invalid API token")
+    else:
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            response = _error(e.status, e.reason)
+        except Overloaded:
+            response = _error(503, "Too many requests in progress, try again shortly", **{"Retry-After": "1"})
+    registry.inc("api_requests_total", route=route, status=str(response.status))
+    return response
+
+
+async def _read_generation_request(request: web.Request) -> dict:
+    """Validated generation parameters from the JSON body; raises HTTPBadRequest."""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Body must be a JSON object")
+    video_id = parse_video_id(str(body.get("video") or ""))
+    if video_id is None:
+        raise web.HTTPBadRequest(reason="'video' must be a YouTube URL or 11-character video ID")
+    formats = body.get("formats") or DEFAULT_FORMATS
+    if not isinstance(formats, list) or not all(platform in VALID_PLATFORMS for platform in formats):
+        raise web.HTTPBadRequest(reason=f"'formats' must be a list of: {', '.join(VALID_PLATFORMS)}")
+    model = body.get("model") or AUTO_MODEL
+    if model != AUTO_MODEL and model not in get_available_models():
+        raise web.HTTPBadRequest(reason=f"Unknown model {model!r}")
+    query = body.get("query")
+    if query is not None and not isinstance(query, str):
+        raise web.HTTPBadRequest(reason="'query' must be a string")
+    return {"video_id": video_id, "platforms": list(dict.fromkeys(formats)), "model": model, "query": query,
+            "use_cache": not body.get("regenerate", False)}
+
+
+def _format_result(platform: str, result, model: str) -> dict:
+    if isinstance(result, Exception):
+        return {"format": platform, "model": model, "error": str(result)}
+    return {"format": platform, "model": model, "text": result, "sections": parse_sections(platform, result)}
+
+
+class Api:
+    """Request handlers; holds the server's API key and concurrency limits."""
+
+    def __init__(self, api_key: str, max_concurrent: int = API_MAX_CONCURRENT_REQUESTS, max_queued: int = API_MAX_QUEUED_REQUESTS,
+                 transcript_workers: int = API_TRANSCRIPT_WORKERS):
+        self.api_key = api_key
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.transcript_workers = transcript_workers
+        self.generations = None  # created on the server's loop, in on_startup
+        self.transcript_slots = None
+
+    async def on_startup(self, app: web.Application):
+        self.generations = ConcurrencyLimit(self.max_concurrent, self.max_queued)
+        self.transcript_slots = asyncio.Semaphore(self.transcript_workers)
+        preload_dependencies()
+
+    def routes(self) -> list:
+        return [
+            web.get("/healthz", self.healthz),
+            web.get("/metrics", self.metrics),
+            web.get("/v1/transcripts/{video}", self.transcript),
+            web.post("/v1/generate", self.generate),
+            web.post("/v1/generate/stream", self.generate_stream),
+            web.post("/v1/jobs", self.create_job),
+            web.get("/v1/jobs/{job_id}", self.job_status),
+            web.get("/v1/outputs", self.search_outputs),
+            web.get("/v1/outputs/{video}", self.video_outputs),
+        ]
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "running": self.generations.running,
+                                  "waiting": self.generations.waiting, **self.generations.stats})
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4"})
+
+    async def _fetch_transcript(self, video_id: str) -> str:
+        async with self.transcript_slots:
+            return await asyncio.to_thread(get_transcript, video_id)
+
+    async def transcript(self, request: web.Request) -> web.Response:
+        video_id = parse_video_id(request.match_info["video"])
+        if video_id is None:
+            return _error(400, "Not a YouTube URL or 11-character video ID")
+        transcript = await self._fetch_transcript(video_id)
+        if not transcript:
+            return _error(404, "No transcript found for this video")
+        return web.json_response({"video_id": video_id, "transcript": transcript})
+
+    async def _run(self, params: dict, on_token: Optional[Callable[[str, Optional[str]], None]] = None) -> dict:
+        """Fetch the transcript and generate every format; the response body, or raises HTTPNotFound."""
+        trace = Trace()
+        started = time.perf_counter()
+        status, error = "failed", None
+        try:
+            with tracing(trace):
+                transcript = await self._fetch_transcript(params["video_id"])
+                if not transcript:
+                    error = "No transcript found for this video"
+                    raise web.HTTPNotFound(reason=error)
+                # Routing may compress the transcript, and saving writes SQLite: both off the loop, so streams keep flowing
+                models = await asyncio.to_thread(resolve_models, transcript, params["platforms"], params["model"])
+                results = await generate_formats(transcript, models, params["platforms"], self.api_key, params["query"],
+                                                 use_cache=params["use_cache"], on_token=on_token)
+                await asyncio.to_thread(save_artifacts, params["video_id"], results, models, params["query"])
+            status = "done"
+            return {
+                "video_id": params["video_id"],
+                "results": [_format_result(platform, result, models[platform]) for platform, result in results.items()],
+                "total": time.perf_counter() - started,
+            }
+        except Exception as e:
+            error = error or str(e)
+            raise
+        finally:
+            await asyncio.to_thread(log_trace, trace, REQUEST_LOG_PATH, source="api", video_id=params["video_id"], model=params["model"],
+                                    formats=params["platforms"], status=status, total=time.perf_counter() - started, error=error)
+
+    async def generate(self, request: web.Request) -> web.Response:
+        params = await _read_generation_request(request)
+        async with self.generations:
+            return web.json_response(await self._run(params))
+
+    async def generate_stream(self, request: web.Request) -> web.StreamResponse:
+        """Server-sent events: `token` {format, text} as output arrives, `reset` {format} when a
+        format restarts and its text so far should be discarded, `result` per format, then
+        `done` {total}, or `error` {error} if the run failed."""
+        params = await _read_generation_request(request)
+        async with self.generations:
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+            events = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+
+            def on_token(platform, text):
+                # Called from whichever thread runs the generation, which is another loop's when joining one in flight
+                if text is None:
+                    loop.call_soon_threadsafe(events.put_nowait, ("reset", {"format": platform}))
+                else:
+                    loop.call_soon_threadsafe(events.put_nowait, ("token", {"format": platform, "text": text}))
+
+            async def run():
+                try:
+                    body = await self._run(params, on_token)
+                    for result in body["results"]:
+                        events.put_nowait(("result", result))
+                    events.put_nowait(("done", {"total": body["total"]}))
+                except web.HTTPException as e:
+                    events.put_nowait(("error", {"error": e.reason}))
+                except Exception as e:
+                    events.put_nowait(("error", {"error": str(e)}))
+
+            task = asyncio.create_task(run())
+            try:
+                while True:
+                    event, data = await events.get()
+                    await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    if event in ("done", "error"):
+                        break
+                await response.write_eof()
+            except ConnectionResetError:
+                pass  # the client went away
+            finally:
+                # Stops this response only: a generation other callers share keeps running for them
+                task.cancel()
+            return response
+
+    async def create_job(self, request: web.Request) -> web.Response:
+        params = await _read_generation_request(request)
+        job = await asyncio.to_thread(job_manager.submit, params["video_id"], params["platforms"], params["model"], self.api_key,
+                                      params["query"], use_cache=params["use_cache"])
+        return web.json_response(_job_body(job), status=202, headers={"Location": f"/v1/jobs/{job.id}"})
+
+    async def job_status(self, request: web.Request) -> web.Response:
+        job = await asyncio.to_thread(job_manager.get, request.match_info["job_id"])
+        if job is None:
+            return _error(404, "No such job")
+        return web.json_response(_job_body(job))
+
+    async def video_outputs(self, request: web.Request) -> web.Response:
+        video_id = parse_video_id(request.match_info["video"])
+        if video_id is None:
+            return _error(400, "Not a YouTube URL or 11-character video ID")
+        outputs = await asyncio.to_thread(get_saved_outputs, video_id)
+        return web.json_response({"video_id": video_id, "outputs": [_artifact_body(a) for a in outputs]})
+
+    async def search_outputs(self, request: web.Request) -> web.Response:
+        text = request.query.get("q", "")
+        if not text.strip():
+            return _error(400, "Pass the search text as ?q=")
+        try:
+            limit = min(int(request.query.get("limit", "20")), 100)
+        except ValueError:
+            return _error(400, "'limit' must be a number")
+        matches = await asyncio.to_thread(search_saved_outputs, text, limit=limit, platform=request.query.get("format"))
+        return web.json_response({"query": text, "outputs": [_artifact_body(a) for a in matches]})
+
+
+def _artifact_body(artifact) -> dict:
+    body = artifact._asdict()
+    if body["snippet"] is None:
+        del body["snippet"]
+    return body
+
+
+def _job_body(job) -> dict:
+    body = {"id": job.id, "video_id": job.video_id, "status": job.status, "formats": job.platforms, "model": job.model,
+            "first_token": job.first_token, "total": job.total, "error": job.error}
+    if job.finished:
+        body["results"] = [
+            _format_result(platform, job.results[platform], job.models.get(platform, job.model)) if platform in job.results
+            else {"format": platform, "error": job.errors.get(platform, "Not generated")}
+            for platform in job.platforms
+        ]
+    else:
+        body["partial"] = {platform: job.partial_text(platform) for platform in job.platforms}
+    return body
+
+
+def create_app(api_key: str, **limits) -> web.Application:
+    api = Api(api_key, **limits)
+    app = web.Application(middlewares=[api_middleware])
+    app.on_startup.append(api.on_startup)
+    app.add_routes(api.routes())
+    return app
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve tutorial, summary and note generation over HTTP.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    parser.add_argument("--api-key", default=os.getenv("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY_STR"))
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+    web.run_app(create_app(args.api_key), host=args.host, port=args.port, print=lambda message: print(message, file=sys.stderr))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Abandoned(Exception):
+    """The loop running a shared call shut down while other callers were still waiting for it."""
+
+
+class _Flight:
+    """One in-flight call: its eventual result plus the stream published so far."""
+
+    def __init__(self):
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()  # a cancelled follower must not cancel everyone's result
+        self.published = []  # argument tuples passed to publish(), replayed to late joiners
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.waiters = 0  # callers still waiting; guarded by SingleFlight._lock
+        self.loop = None  # async flights: the loop running the shared task
+        self.task = None
+
+    def publish(self, *args):
+        with self.lock:
+            self.published.append(args)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            # One caller's broken callback (say, a closed stream) must not fail the work everyone shares
+            try:
+                subscriber(*args)
+            except Exception as e:
+                print(f"[SingleFlight] Dropping a subscriber that failed: {e!r}")
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, callback: Callable[..., None]):
+        with self.lock:
+            published = list(self.published)
+            self.subscribers.append(callback)
+        for args in published:
+            callback(*args)
+
+    def unsubscribe(self, callback: Callable[..., None]):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one upstream call.
+
+    The first caller for a key runs the work; callers arriving while it is in flight wait
+    for the same result instead of repeating it. Futures are thread-safe, so this works
+    across Streamlit sessions, which each run their own event loop on their own thread.
+    Streamed output is fanned out too: followers get everything published so far and
+    then each new piece, called from the leader's thread.
+
+    Async work runs as a task the flight owns, so a caller that is cancelled (say, a client
+    that disconnected) only stops waiting; the work is cancelled once no caller is left.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def _join(self, key: Hashable):
+        """Return (flight, is_leader)."""
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                flight.waiters += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            flight.waiters = 1
+            return flight, True
+
+    def _land(self, key: Hashable, flight: _Flight, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Blocking: run fn() once per key among concurrent callers."""
+        if not self.enabled:
+            return fn()
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[Callable[..., None]], Awaitable[T]],
+                       on_publish: Optional[Callable[..., None]] = None, on_restart: Optional[Callable[[], None]] = None) -> T:
+        """Run fn(publish) once per key; everything it publishes reaches every caller's on_publish.
+
+        The work runs on the loop of the caller that started it. If that loop shuts down
+        while others still wait, one of them starts the work again and each remaining
+        caller's on_restart is called first, to discard what it was sent so far.
+        """
+        if not self.enabled:
+            return await fn(on_publish or (lambda *args: None))
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                flight.loop = asyncio.get_running_loop()
+                flight.task = flight.loop.create_task(fn(flight.publish))
+                flight.task.add_done_callback(lambda task, flight=flight: self._land_task(key, flight, task))
+            try:
+                if on_publish:
+                    flight.subscribe(on_publish)
+                return await asyncio.wrap_future(flight.future)
+            except _Abandoned:
+                if on_restart:
+                    on_restart()
+            except BaseException:
+                # Cancelled, or this caller's own on_publish failed replaying the stream: only it stops waiting
+                self._leave(key, flight)
+                raise
+            finally:
+                if on_publish:
+                    flight.unsubscribe(on_publish)
+
+    def _land_task(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if task.cancelled():
+            self._land(key, flight, error=_Abandoned())
+        elif task.exception() is not None:
+            self._land(key, flight, error=task.exception())
+        else:
+            self._land(key, flight, task.result())
+
+    def _leave(self, key: Hashable, flight: _Flight):
+        """A cancelled caller stops waiting; the last one to go cancels the shared task."""
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight.future.done():
+                return
+            # Callers arriving from now on start a fresh flight rather than join a cancelled one
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        try:
+            flight.loop.call_soon_threadsafe(flight.task.cancel)
+        except RuntimeError:
+            pass  # the loop has already closed, taking the task with it
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["in_flight"] = len(self._flights)
+        return stats
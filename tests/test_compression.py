@@ -0,0 +1,42 @@
+"""compression.compress_transcript: what cleanup removes, and what it must leave alone."""
+import pytest
+
+from compression import compress_transcript
+
+
+@pytest.mark.parametrize("said, kept", [
+    ("I had had enough", "I had had enough"),
+    ("that that is true", "that that is true"),
+    ("what it is is a cache", "what it is is a cache"),
+    ("knock knock", "knock knock"),
+    ("drill a 5 mm hole", "drill a 5 mm hole"),
+    ("HM the Queen", "HM the Queen"),
+    ("press Ctrl C Ctrl C to stop", "press Ctrl C Ctrl C to stop"),
+    ("set it to 2 2 times", "set it to 2 2 times"),
+    ("run ls -la ls -la", "run ls -la ls -la"),
+])
+def test_meaningful_repeats_are_kept(said, kept):
+    assert compress_transcript(said).text == kept
+
+
+@pytest.mark.parametrize("said, cleaned", [
+    ("I I think the the value is right", "I think the value is right"),
+    ("so we need to we need to restart", "so we need to restart"),
+    ("no no no no that's wrong", "no that's wrong"),
+    ("um so hmm mmm we start", "so we start"),
+    ("[Music] okay uh let's go", "okay let's go"),
+])
+def test_stutters_and_fillers_are_removed(said, cleaned):
+    assert compress_transcript(said).text == cleaned
+
+
+def test_rolling_caption_overlap_is_dropped():
+    transcript = "first we open the terminal\nopen the terminal and run the build\nrun the build"
+    assert compress_transcript(transcript).text == "first we open the terminal\nand run the build"
+
+
+def test_budget_drops_least_informative_lines_first():
+    transcript = "\n".join(["so yeah that is it you know"] * 3 + ["run docker compose up -d on port 8080"])
+    result = compress_transcript(transcript, target_tokens=12)
+    assert result.text.splitlines()[-1] == "run docker compose up -d on port 8080"
+    assert result.output_tokens <= 12 and result.dropped_lines > 0
@@ -0,0 +1,36 @@
+"""sections.SectionParser against the regex parsing it replaced, whole and streamed.
+
+Run with: python -m pytest tests
+"""
+import pytest
+
+from benchmarks.bench_parser import ADVERSARIAL, SAMPLES, regex_parse, streamed
+from sections import NO_NOTES, NO_TAKEAWAYS, SectionParser, parse_sections
+
+
+@pytest.mark.parametrize("platform", SAMPLES)
+def test_typical_output_matches_regex(platform):
+    content = SAMPLES[platform](2000)
+    assert parse_sections(platform, content) == regex_parse(platform, content)
+
+
+@pytest.mark.parametrize("platform, fallback", [("note taking", {"notes": NO_NOTES}), ("summary", {"takeaways": NO_TAKEAWAYS})])
+def test_adversarial_output_falls_back(platform, fallback):
+    content = ADVERSARIAL[platform](2000)
+    expected = {"summary": content.strip(), **fallback}
+    assert parse_sections(platform, content) == expected
+    assert regex_parse(platform, content) == expected
+
+
+@pytest.mark.parametrize("platform, make", [*SAMPLES.items(), *ADVERSARIAL.items()])
+@pytest.mark.parametrize("chunk", [1, 7, 37, 4096])
+def test_streamed_matches_whole(platform, make, chunk):
+    content = make(2000)
+    assert streamed(platform, content, chunk) == parse_sections(platform, content)
+
+
+def test_headers_split_across_chunks():
+    parser = SectionParser("summary")
+    for piece in ["Summ", "ary: Short. Key Take", "aways", ":\n- one\n- two"]:
+        parser.feed(piece)
+    assert parser.close() == {"summary": "Short.", "takeaways": "- one\n- two"}
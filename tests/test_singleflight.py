@@ -0,0 +1,109 @@
+"""singleflight.SingleFlight: coalescing, stream replay, cancellation and failing subscribers."""
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def make_work(runs: list, release: asyncio.Event, pieces=("a", "b")):
+    """fn(publish) that publishes the first piece, waits for release, then the rest."""
+
+    async def work(publish):
+        runs.append(1)
+        publish(pieces[0])
+        await release.wait()
+        for piece in pieces[1:]:
+            publish(piece)
+        return "".join(pieces)
+
+    return work
+
+
+def test_follower_replays_published_stream():
+    async def main():
+        flights, runs, release = SingleFlight(), [], asyncio.Event()
+        leader_seen, follower_seen = [], []
+        leader = asyncio.create_task(flights.do_async("k", make_work(runs, release), leader_seen.append))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.do_async("k", make_work(runs, release), follower_seen.append))
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await leader == await follower == "ab"
+        assert leader_seen == follower_seen == ["a", "b"]
+        assert len(runs) == 1
+        assert flights.get_stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+
+    asyncio.run(main())
+
+
+def test_cancelled_leader_leaves_work_running_for_follower():
+    async def main():
+        flights, runs, release = SingleFlight(), [], asyncio.Event()
+        leader = asyncio.create_task(flights.do_async("k", make_work(runs, release)))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.do_async("k", make_work(runs, release)))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await follower == "ab"
+        assert leader.cancelled()
+        assert len(runs) == 1
+
+    asyncio.run(main())
+
+
+def test_last_caller_leaving_cancels_work():
+    async def main():
+        flights, runs, release = SingleFlight(), [], asyncio.Event()
+        callers = [asyncio.create_task(flights.do_async("k", make_work(runs, release))) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert flights.get_stats()["in_flight"] == 0
+        # A new caller starts fresh work rather than joining the cancelled one
+        release.set()
+        assert await flights.do_async("k", make_work(runs, release)) == "ab"
+        assert len(runs) == 2
+
+    asyncio.run(main())
+
+
+def test_failing_subscriber_is_dropped_without_failing_others():
+    async def main():
+        flights, runs, release = SingleFlight(), [], asyncio.Event()
+        leader_seen, broken_calls = [], []
+
+        def broken(piece):
+            broken_calls.append(piece)
+            if piece == "b":
+                raise ConnectionResetError("client went away")
+
+        leader = asyncio.create_task(flights.do_async("k", make_work(runs, release, ("a", "b", "c")), leader_seen.append))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.do_async("k", make_work(runs, release), broken))
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await leader == "abc"
+        assert await follower == "abc"
+        assert leader_seen == ["a", "b", "c"]
+        assert broken_calls == ["a", "b"]
+
+    asyncio.run(main())
+
+
+def test_error_reaches_every_caller():
+    async def main():
+        flights = SingleFlight()
+
+        async def failing(publish):
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        callers = [asyncio.create_task(flights.do_async("k", failing)) for _ in range(3)]
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError] * 3
+        assert flights.get_stats()["in_flight"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+
+class TrackChoice(NamedTuple):
+    """A transcript track to fetch, optionally translated, and whether it is in a preferred language."""
+    track: Any  # youtube_transcript_api Transcript (or a stand-in with the same attributes)
+    translate_to: Optional[str]
+    preferred: bool
+
+    def describe(self) -> str:
+        kind = "auto-generated" if self.track.is_generated else "manual"
+        target = f" -> {self.translate_to}" if self.translate_to else ""
+        return f"{self.track.language_code} ({kind}){target}"
+
+
+def _base(code: str) -> str:
+    return code.lower().split("-")[0]
+
+
+def plan_tracks(tracks: Sequence[Any], languages: Sequence[str], translate: bool = True) -> List[TrackChoice]:
+    """Every way to get a transcript for the video, best first.
+
+    1. a track in a preferred language, in preference order, manual before auto-generated;
+       exact codes before regional variants ("en" before "en-GB")
+    2. a track translated into the first preferred language, manual tracks first
+    3. any other track in its own language, manual first
+    """
+    manual_first = sorted(tracks, key=lambda track: track.is_generated)
+    choices, seen = [], set()
+
+    def add(track, translate_to=None, preferred=False):
+        key = (track.language_code, track.is_generated, translate_to)
+        if key not in seen:
+            seen.add(key)
+            choices.append(TrackChoice(track, translate_to, preferred))
+
+    for language in languages:
+        for track in manual_first:
+            if track.language_code.lower() == language.lower():
+                add(track, preferred=True)
+        for track in manual_first:
+            if _base(track.language_code) == _base(language):
+                add(track, preferred=True)
+    if translate and languages:
+        target = languages[0]
+        for track in manual_first:
+            targets = {language.language_code for language in getattr(track, "translation_languages", ())}
+            if track.is_translatable and target in targets:
+                add(track, translate_to=target)
+    for track in manual_first:
+        add(track)
+    return choices
+
+
+class TrackListCache:
+    """Per-video transcript track listings, kept for `ttl` seconds so repeat requests skip the listing call.
+
+    Listings hold signed caption URLs that expire, so they live in memory for a short
+    time rather than in the on-disk transcript cache.
+    """
+
+    def __init__(self, ttl: float = 1800, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # video_id -> (listed_at, tracks)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, video_id: str, list_tracks: Callable[[], Sequence[Any]]) -> List[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(video_id)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        tracks = list(list_tracks())
+        with self._lock:
+            self._entries[video_id] = (now, tracks)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tracks
+
+    def invalidate(self, video_id: str):
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
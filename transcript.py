@@ -0,0 +1,64 @@
+import base64
+import io
+import json
+import sys
+from array import array
+from typing import Iterable, Tuple
+
+
+class Transcript:
+    """Compact transcript: one text buffer plus an array of snippet start times.
+
+    Snippets are stored one per line in `text`, which is exactly what the prompts embed,
+    so handing the transcript to a prompt builder never copies or re-joins it. starts[i]
+    is when the snippet on line i begins, kept so timestamps don't need another fetch.
+    """
+
+    __slots__ = ("text", "starts")
+
+    def __init__(self, text: str, starts: array):
+        self.text = text
+        self.starts = starts  # starts[i] is snippet i's start time in seconds
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[Tuple[str, float]]) -> "Transcript":
+        """Build from (text, start) pairs, normalizing whitespace in the same pass."""
+        buffer = io.StringIO()
+        starts = array("d")
+        for raw_text, start in snippets:
+            text = " ".join(raw_text.split())
+            if not text:
+                continue
+            if starts:
+                buffer.write("\n")
+            starts.append(float(start))
+            buffer.write(text)
+        return cls(buffer.getvalue(), starts)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return bool(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the text and the start times."""
+        return sys.getsizeof(self.text) + sys.getsizeof(self.starts)
+
+    def serialize(self) -> str:
+        """A JSON header line with the start times in base64, then the text as is.
+
+        Unlike one JSON document, writing it needs no escaped copy of the text, reading it
+        needs no parse, and the start times never become one Python object per snippet.
+        """
+        header = json.dumps({"starts": base64.b64encode(self.starts.tobytes()).decode("ascii")})
+        return f"{header}\n{self.text}"
+
+    @classmethod
+    def deserialize(cls, data: str) -> "Transcript":
+        end = data.index("\n")
+        header = json.loads(data[:end])
+        starts = array("d")
+        starts.frombytes(base64.b64decode(header["starts"]))
+        return cls(data[end + 1:], starts)
@@ -1,24 +1,97 @@
+"""Core pipeline: fetch transcripts, build prompts and generate with Gemini.
+
+Streamlit-free, so the CLI, benchmarks and background jobs can use it too. The Gemini
+SDK (grpc, protobuf), youtube_transcript_api and requests are imported on first use
+rather than at import time; call preload_dependencies() to warm them in the background.
+"""
 import re
-from youtube_transcript_api import YouTubeTranscriptApi
-from typing import List, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Callable, List, Optional, Tuple, Union
 import asyncio
-import google.generativeai as genai
+import datetime
+import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
+import sys
 from dotenv import load_dotenv
-import aiohttp
-import streamlit as st
-from prompts import build_social_media_prompt, build_tutorial_prompt, build_merged_summary_prompt, build_note_taking_prompt
+from cache import DiskCache, MemoryCache, cache_key
+from artifacts import Artifact, ArtifactStore
+from clients import GeminiClientPool
+from scheduler import RequestScheduler
+from chunking import chunk_transcript, estimate_tokens
+from compression import CompressionResult, compress_transcript
+from transcript import Transcript
+from tracks import TrackChoice, TrackListCache, plan_tracks
+from singleflight import SingleFlight
+from routing import AUTO_MODEL, ModelRouter
+from hedging import HedgePolicy, hedged_stream
+from metrics import format_label, record_compression, record_span, record_tokens, registry, span, start_metrics_server
+from prompts import (Prompt, build_transcript_context, build_format_instructions, build_multi_format_prompt, split_multi_format_output,
+                     MultiFormatDemux, build_chunk_map_prompt, merge_chunk_extracts, estimate_prompt_tokens, PROMPT_VERSION)
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
 
 
 
 # === Environment Variables ===
 load_dotenv()
 
-key = os.getenv("GEMINI_API_KEY")
-st.session_state.gemini_api_key = key
 my_api_key = os.getenv("GEMINI_API_KEY_STR")
 
 TEMPERATURE = 0.7  # Default temperature for Gemini API
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")  # Override the API host, e.g. a local fake server for benchmarks
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")  # "rest" or "grpc"; None lets the SDK decide
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "8"))
+# Per (API key, model) budgets enforced before calling Gemini; 0 disables a limit
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))  # seconds, doubled per attempt
+GEMINI_CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", "180"))  # seconds per attempt from when it starts; 0 disables
+GEMINI_CALL_TOTAL_TIMEOUT = float(os.getenv("GEMINI_CALL_TOTAL_TIMEOUT", "300"))  # seconds per attempt including time queued for a thread; 0 disables
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0"))  # hedge calls slower than this TTFT percentile; 0 disables
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))  # max hedges as a fraction of calls
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+# With GEMINI_TRANSPORT=rest, collect garbage after streaming a prompt of at least this many tokens: that
+# transport leaves its copies of the request body in reference cycles that would otherwise outlive the
+# request (bench_memory, 20k snippets, --shared-context off: 7.7 -> 5.8 MB retained); 0 disables
+LARGE_PROMPT_GC_TOKENS = int(os.getenv("LARGE_PROMPT_GC_TOKENS", "100000"))
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+TRANSCRIPT_CACHE_TTL = float(os.getenv("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "256"))
+TRANSCRIPT_CACHE_MEMORY_MB = float(os.getenv("TRANSCRIPT_CACHE_MEMORY_MB", "64"))  # decoded transcripts also kept in memory
+TRANSCRIPT_LANGUAGES = [code.strip() for code in os.getenv("TRANSCRIPT_LANGUAGES", "en").split(",") if code.strip()]  # preferred, best first
+TRANSCRIPT_TRANSLATE = os.getenv("TRANSCRIPT_TRANSLATE", "1") == "1"  # translate another track when none is in a preferred language
+TRANSCRIPT_PROBE_WIDTH = int(os.getenv("TRANSCRIPT_PROBE_WIDTH", "3"))  # fallback tracks fetched at once
+TRANSCRIPT_TRACKS_TTL = float(os.getenv("TRANSCRIPT_TRACKS_TTL", "1800"))  # seconds a video's track listing is reused
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+GENERATION_CACHE_MAX_MB = float(os.getenv("GENERATION_CACHE_MAX_MB", "256"))
+GENERATION_CACHE_MEMORY_MB = float(os.getenv("GENERATION_CACHE_MEMORY_MB", "32"))
+ARTIFACT_RETENTION_DAYS = float(os.getenv("ARTIFACT_RETENTION_DAYS", "365"))  # 0 keeps outputs until the size budget evicts them
+ARTIFACT_STORE_MAX_MB = float(os.getenv("ARTIFACT_STORE_MAX_MB", "512"))
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "0") == "1"  # strip filler, markers and repeats before prompting
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "0"))  # with compression on, drop low-information lines beyond this; 0 keeps all
+# Map-reduce generation for long transcripts; 0 disables it
+CHUNKED_GENERATION_THRESHOLD = int(os.getenv("CHUNKED_GENERATION_THRESHOLD", "50000"))  # estimated tokens
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "20000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "500"))
+CHUNK_PARALLELISM = int(os.getenv("CHUNK_PARALLELISM", "4"))
+# How several formats share one transcript: "auto" tries a Gemini context cache, then one combined
+# request if the transcript is most of each format's prompt (a combined request streams the formats
+# one after another); "cache" / "combined" force one strategy; "off" sends each format its own copy.
+SHARED_CONTEXT_MODE = os.getenv("SHARED_CONTEXT_MODE", "auto")
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "2048"))  # the API rejects smaller explicit caches
+CONTEXT_CACHE_TTL_MINUTES = int(os.getenv("CONTEXT_CACHE_TTL_MINUTES", "10"))
+CONTEXT_CACHE_REFUSED_TTL = float(os.getenv("CONTEXT_CACHE_REFUSED_TTL", "3600"))  # seconds a key and model the API refused a cache to skip trying
+COMBINED_MIN_TRANSCRIPT_SHARE = float(os.getenv("COMBINED_MIN_TRANSCRIPT_SHARE", "0.9"))  # "auto" only combines when the transcript is this share of each prompt
+# Model routing when the caller asks for "auto": seconds a generation should take (0 disables
+# latency adaptation) and the most a single call may cost in USD (0 disables the cap)
+ROUTING_LATENCY_SLO = float(os.getenv("ROUTING_LATENCY_SLO", "60"))
+ROUTING_MAX_COST_USD = float(os.getenv("ROUTING_MAX_COST_USD", "0"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve Prometheus metrics at :PORT/metrics; 0 disables
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH")  # one JSON line per request; unset prints to stdout
 VALID_PLATFORMS = ["Twitter", "Facebook", "Instagram", "LinkedIn", "Tutorial Blog", "Summary", "Note Taking"]
 
 def extract_video_id(url):
@@ -27,85 +100,716 @@ def extract_video_id(url):
     match = re.search(regex, url)
     return match.group(1) if match else None
 
+VIDEO_ID_PATTERN = re.compile(r"^[a-zA-Z0-9_-]{11}$")
+
+def parse_video_id(text: str) -> Optional[str]:
+    """The video ID in a YouTube link, or the text itself if it is a bare ID; None otherwise."""
+    text = text.strip()
+    return extract_video_id(text) or (text if VIDEO_ID_PATTERN.match(text) else None)
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
+# Shared by every session in this process; backed by SQLite so it survives restarts.
+transcript_cache = DiskCache(
+    os.path.join(CACHE_DIR, "transcripts.sqlite3"),
+    ttl_seconds=TRANSCRIPT_CACHE_TTL,
+    max_bytes=int(TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024),
+    memory_bytes=0,  # transcript_memory holds them decoded instead
+)
+# Decoded transcripts, shared by reference: every session and request for a video gets the same text
+# object rather than its own copy, and the total stays within TRANSCRIPT_CACHE_MEMORY_MB.
+transcript_memory = MemoryCache(int(TRANSCRIPT_CACHE_MEMORY_MB * 1024 * 1024))
+# Completed Gemini responses, keyed on the hash of the fully built prompt, model and temperature.
+generation_cache = DiskCache(
+    os.path.join(CACHE_DIR, "generations.sqlite3"),
+    ttl_seconds=GENERATION_CACHE_TTL,
+    max_bytes=int(GENERATION_CACHE_MAX_MB * 1024 * 1024),
+    memory_bytes=int(GENERATION_CACHE_MEMORY_MB * 1024 * 1024),
+)
+# Every output generated, by video, for browsing and full-text search; unlike the caches above it is not keyed on the transcript.
+artifact_store = ArtifactStore(
+    os.path.join(CACHE_DIR, "artifacts.sqlite3"),
+    retention_days=ARTIFACT_RETENTION_DAYS,
+    max_bytes=int(ARTIFACT_STORE_MAX_MB * 1024 * 1024),
+)
+# Retention and compaction once per process, off the import path
+threading.Thread(target=artifact_store.compact, name="artifact-compact", daemon=True).start()
+
+# Concurrent identical requests (e.g. many users pasting the same link) share one upstream call.
+transcript_flights = SingleFlight()
+generation_flights = SingleFlight()
+
+def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters for the caches, for sizing them."""
+    return {"transcripts": {**transcript_cache.get_stats(), "memory": transcript_memory.get_stats()}, "generations": generation_cache.get_stats(),
+            "artifacts": artifact_store.get_stats()}
+
+def save_artifacts(video_id: str, results: dict, models: dict, user_query: Optional[str] = None):
+    """Store the successful outputs of generate_formats() for a video in artifact_store.
+
+    Best effort: the outputs were already generated, so a store that can't be written
+    (locked, read-only or full disk) is reported and skipped rather than failing the request.
+    """
+    with span("artifact_save"):
+        for platform, result in results.items():
+            if isinstance(result, str) and result:
+                try:
+                    artifact_store.save(video_id, platform, models[platform], result, PROMPT_VERSION, user_query)
+                except Exception as e:
+                    print(f"[Artifacts] Couldn't save {platform} for {video_id}: {e}")
+
+def get_saved_outputs(video_id: str) -> List[Artifact]:
+    """Outputs generated for a video before, newest first."""
+    return artifact_store.for_video(video_id)
+
+def search_saved_outputs(text: str, limit: int = 20, platform: Optional[str] = None) -> List[Artifact]:
+    """Full-text search over every output generated before, best match first."""
+    return artifact_store.search(text, limit=limit, platform=platform)
+
+def get_hedging_stats() -> dict:
+    """Hedged (duplicated) Gemini calls, how often the duplicate won, and what it cost."""
+    return hedge_policy.get_stats()
+
+# Which caption tracks each video has; saves the listing request on repeat fetches
+transcript_tracks = TrackListCache(ttl=TRANSCRIPT_TRACKS_TTL)
+_transcript_probe_executor = ThreadPoolExecutor(max_workers=max(1, TRANSCRIPT_PROBE_WIDTH), thread_name_prefix="transcript-probe")
+
+def get_coalescing_stats() -> dict:
+    """How many calls joined an identical call already in flight instead of going upstream."""
+    return {"transcripts": transcript_flights.get_stats(), "generations": generation_flights.get_stats()}
+
+# Imported on first fetch; benchmarks replace it with a fake
+YouTubeTranscriptApi = None
+
+def _transcript_api_class():
+    global YouTubeTranscriptApi
+    if YouTubeTranscriptApi is None:
+        from youtube_transcript_api import YouTubeTranscriptApi as api_class
+        YouTubeTranscriptApi = api_class
+    return YouTubeTranscriptApi
+
+_preload_started = False
+_preload_lock = threading.Lock()
+
+def _import_heavy_dependencies():
+    import google.generativeai  # noqa: F401
+    import google.ai.generativelanguage  # noqa: F401
+    import requests  # noqa: F401
+    _transcript_api_class()
+
+def preload_dependencies():
+    """Import the SDKs on a background thread so the first request doesn't pay for them; idempotent."""
+    global _preload_started
+    with _preload_lock:
+        if _preload_started:
+            return
+        _preload_started = True
+    threading.Thread(target=_import_heavy_dependencies, name="preload", daemon=True).start()
+
 # === Fetch YouTube transcript (patched for .to_raw_data()) ===
-def get_transcript(video_id: str, languages: List[str] = None) -> str:
+def get_transcript_data(video_id: str, languages: List[str] = None, use_cache: bool = True) -> Optional[Transcript]:
+    """Fetch a transcript with its snippet start times; None if unavailable.
+
+    `languages` are preferred codes, best first (default TRANSCRIPT_LANGUAGES); see
+    _fetch_transcript for what happens when the video has none of them.
+    """
     if languages is None:
-        languages = ["en"]
+        languages = TRANSCRIPT_LANGUAGES
+    key = cache_key("transcript-data-v2", video_id, *languages)
+    with span("transcript_fetch"):
+        if use_cache:
+            transcript = transcript_memory.get(key)
+            if transcript is not None:
+                return transcript
+            cached = transcript_cache.get(key)
+            if cached is not None:
+                transcript = Transcript.deserialize(cached)
+                transcript_memory.set(key, transcript, transcript.nbytes, time.time() + TRANSCRIPT_CACHE_TTL)
+                return transcript
+        return transcript_flights.do(key, lambda: _fetch_transcript(video_id, languages, key))
+
+def _fetch_track(choice: TrackChoice) -> Transcript:
+    track = choice.track.translate(choice.translate_to) if choice.translate_to else choice.track
+    return Transcript.from_snippets((snippet.text, snippet.start) for snippet in track.fetch())
+
+def _fetch_first(choices: List[TrackChoice]) -> Optional[Tuple[TrackChoice, Transcript]]:
+    """Fetch several candidate tracks at once; the best one that succeeds wins."""
+    futures = [_transcript_probe_executor.submit(_fetch_track, choice) for choice in choices]
     try:
-        youtube_api = YouTubeTranscriptApi()
-        fetched_transcript = youtube_api.fetch(video_id, languages=languages).to_raw_data()
-        transcript_text = " ".join([snippet['text'] for snippet in fetched_transcript])
-        return transcript_text
+        for choice, future in zip(choices, futures):
+            try:
+                transcript = future.result()
+            except Exception as e:
+                print(f"[Transcript] {choice.describe()} failed: {e}")
+                continue
+            if transcript:
+                return choice, transcript
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _fetch_transcript(video_id: str, languages: List[str], key: str) -> Optional[Transcript]:
+    """List the video's tracks (once per TRANSCRIPT_TRACKS_TTL) and fetch the best one.
+
+    A track in a preferred language, manual before auto-generated, is fetched on its own.
+    Without one, the fallbacks (a translation into the first preferred language, then
+    the video's own languages) are probed TRANSCRIPT_PROBE_WIDTH at a time and the best
+    that succeeds is used.
+    """
+    try:
+        youtube_api = _transcript_api_class()()
+        tracks = transcript_tracks.get(video_id, lambda: youtube_api.list(video_id))
     except Exception as e:
-        print(f"[Transcript] Error fetching transcript for {video_id}: {e}")
-        return ""
+        print(f"[Transcript] Error listing transcripts for {video_id}: {e}")
+        return None
+    choices = plan_tracks(tracks, languages, translate=TRANSCRIPT_TRANSLATE)
+    preferred = [choice for choice in choices if choice.preferred]
+    fallbacks = [choice for choice in choices if not choice.preferred]
+    batches = [[choice] for choice in preferred]
+    batches += [fallbacks[i:i + TRANSCRIPT_PROBE_WIDTH] for i in range(0, len(fallbacks), max(1, TRANSCRIPT_PROBE_WIDTH))]
+    for batch in batches:
+        found = _fetch_first(batch)
+        if found is not None:
+            choice, transcript = found
+            if not choice.preferred:
+                print(f"[Transcript] No {'/'.join(languages)} transcript for {video_id}; using {choice.describe()}")
+            transcript_cache.set(key, transcript.serialize())
+            transcript_memory.set(key, transcript, transcript.nbytes, time.time() + TRANSCRIPT_CACHE_TTL)
+            return transcript
+    # Signed caption URLs may have expired; list again next time
+    transcript_tracks.invalidate(video_id)
+    print(f"[Transcript] No transcript available for {video_id}")
+    return None
+
+def get_transcript(video_id: str, languages: List[str] = None, use_cache: bool = True) -> str:
+    """Transcript text, one whitespace-normalized snippet per line; "" if unavailable."""
+    transcript = get_transcript_data(video_id, languages, use_cache)
+    return transcript.text if transcript else ""
 
-def format_transcript(transcript: str) -> str:
-    """Format the transcript text for better readability."""
-    # Remove extra spaces and newlines
-    formatted = re.sub(r'\s+', ' ', transcript).strip()
-    return formatted
+def _compressed(video_transcript: str) -> CompressionResult:
+    """compress_transcript() with TRANSCRIPT_TOKEN_BUDGET, reused by routing and every format of a request.
 
-def preview_prompt(transcript: str, platform: str, user_query: Optional[str] = None) -> str:
-    """Returns the exact prompt that would be sent to Ollama for preview/debug purposes."""
-    if platform.lower() == "tutorial blog":
-        return build_tutorial_prompt(transcript, platform, user_query)
-    elif platform.lower() == "summary":
-        return build_merged_summary_prompt(transcript, platform, user_query)
-    return build_social_media_prompt(transcript, platform, user_query)
+    Kept in transcript_memory under a hash of the input, so only the compressed text is held,
+    within the same byte budget as the decoded transcripts.
+    """
+    key = cache_key("compressed-transcript", TRANSCRIPT_TOKEN_BUDGET, video_transcript)
+    compressed = transcript_memory.get(key)
+    if compressed is None:
+        compressed = compress_transcript(video_transcript, TRANSCRIPT_TOKEN_BUDGET)
+        transcript_memory.set(key, compressed, sys.getsizeof(compressed.text), time.time() + TRANSCRIPT_CACHE_TTL)
+    return compressed
+
+def prepare_transcript(video_transcript: str) -> str:
+    """The transcript as the prompts see it: compressed when TRANSCRIPT_COMPRESSION is on, else unchanged."""
+    if not TRANSCRIPT_COMPRESSION:
+        return video_transcript
+    return _compressed(video_transcript).text or video_transcript
+
+def preview_prompt(transcript: str, platform: str, user_query: Optional[str] = None) -> Prompt:
+    """Returns the exact prompt that would be sent to Gemini for preview/debug purposes (str() it for the text)."""
+    return build_transcript_context(transcript) + build_format_instructions(platform, user_query)
 
 
 def get_available_models():
     """Fetch available Gemini models (hardcoded as Gemini doesn't have a dynamic list endpoint like Ollama)."""
     return ["gemini-2.5-flash", "gemini-2.5-flash-lite"]
 
-    
+# The Gemini SDK streams synchronously, so generations are offloaded to a bounded
+# thread pool to keep the event loop free and let asyncio.gather run them side by side.
+_generation_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS, thread_name_prefix="gemini")
+
+# Clients and models are created once per process and reused across calls and sessions.
+gemini_clients = GeminiClientPool(transport=GEMINI_TRANSPORT, api_endpoint=GEMINI_API_ENDPOINT)
+
+model_router = ModelRouter(latency_slo=ROUTING_LATENCY_SLO, max_cost=ROUTING_MAX_COST_USD)
+
+gemini_scheduler = RequestScheduler(
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+    max_retries=GEMINI_MAX_RETRIES,
+    base_delay=GEMINI_RETRY_BASE_DELAY,
+)
+
+hedge_policy = HedgePolicy(percentile=GEMINI_HEDGE_PERCENTILE, budget=GEMINI_HEDGE_BUDGET, min_samples=GEMINI_HEDGE_MIN_SAMPLES)
+
+def _is_transient(e: Exception) -> bool:
+    """Quota, overload and network errors that are worth retrying."""
+    from google.api_core import exceptions as google_exceptions
+    import requests
+    return isinstance(e, (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.DeadlineExceeded,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        ConnectionError,
+    ))
+
+def _is_auth_error(e: Exception) -> bool:
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(e, (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied))
+
+class GeminiAPIError(RuntimeError):
+    """A failed Gemini call; `retryable` is set for transient errors hit before any output."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+_configured_api_key = None
+_configure_lock = threading.Lock()
+
+def configure_gemini(api_key: str):
+    """Point the SDK's global default clients (used for context caching) at api_key.
+
+    Reconfiguring throws away the SDK's clients, so it only happens when the key changes.
+    Callers should hold _configure_lock until they are done with the default clients.
+    """
+    global _configured_api_key
+    if api_key == _configured_api_key:
+        return
+    import google.generativeai as genai
+    options = {"api_key": api_key}
+    if GEMINI_TRANSPORT:
+        options["transport"] = GEMINI_TRANSPORT
+    if GEMINI_API_ENDPOINT:
+        options["client_options"] = {"api_endpoint": GEMINI_API_ENDPOINT}
+    genai.configure(**options)
+    _configured_api_key = api_key
+
+async def gemini_stream(prompt: Union[str, Prompt], model: str, api_key: str = my_api_key, temperature: float = TEMPERATURE,
+                        cached_content: Optional["genai.caching.CachedContent"] = None, usage: Optional[dict] = None,
+                        on_start: Optional[Callable[[], None]] = None) -> AsyncIterator[str]:
+    """Yield text chunks as Gemini produces them; with cached_content the prompt is appended to that cached context.
+
+    The blocking SDK stream is consumed on the generation thread pool and handed to the
+    event loop chunk by chunk. Closing the iterator early stops reading the stream, and
+    one closed while still waiting for a thread never sends its request. on_start is
+    called on the event loop once a thread picks the call up, so timers can leave out
+    the wait. If given, `usage` is filled with the reported "input" and "output" token counts.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        opened = False
+        try:
+            if stop.is_set():
+                return  # abandoned while queued for a thread: a losing hedge or an attempt past its deadline
+            if on_start:
+                loop.call_soon_threadsafe(on_start)
+            # Looked up here rather than on the event loop, since the first call imports the SDK
+            if cached_content is not None:
+                gemini_model = gemini_clients.get_cached_content_model(api_key, cached_content, temperature)
+            else:
+                gemini_model = gemini_clients.get_model(api_key, model, temperature)
+            # A Prompt goes out as the text parts of one message, without joining it into one string
+            contents = list(prompt.parts) if isinstance(prompt, Prompt) else prompt
+            if stop.is_set():
+                return
+            opened = True
+            for chunk in gemini_model.generate_content(contents, stream=True):
+                if stop.is_set():
+                    break
+                if usage is not None and chunk.usage_metadata:
+                    usage["input"] = chunk.usage_metadata.prompt_token_count
+                    usage["output"] = chunk.usage_metadata.candidates_token_count
+                if chunk.text:
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+        except Exception as e:
+            if _is_auth_error(e):
+                # Revoked or rotated key: don't keep handing out its client
+                gemini_clients.invalidate(api_key)
+            error = GeminiAPIError(f"Gemini API error: {str(e)}", retryable=_is_transient(e))
+            error.__cause__ = e
+            loop.call_soon_threadsafe(queue.put_nowait, error)
+        finally:
+            if (opened and GEMINI_TRANSPORT == "rest" and LARGE_PROMPT_GC_TOKENS and cached_content is None
+                    and estimate_prompt_tokens(prompt) >= LARGE_PROMPT_GC_TOKENS):
+                gc.collect()
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producer = loop.run_in_executor(_generation_executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.cancel()  # only takes effect while the call is still queued for a thread
+        if producer.done() and not producer.cancelled():
+            producer.result()
+
+async def gemini_generate(prompt: Union[str, Prompt], model: str, api_key: str = my_api_key, temperature: float = TEMPERATURE,
+                          cached_content: Optional["genai.caching.CachedContent"] = None, on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    """Generate text, calling on_chunk with each piece as it streams in.
+
+    Calls go through gemini_scheduler, so they queue when over the RPM/TPM budget and
+    transient failures are retried as long as nothing has been streamed yet. Each attempt
+    must finish within GEMINI_CALL_TIMEOUT of starting on a generation thread, and within
+    GEMINI_CALL_TOTAL_TIMEOUT including the time it waited for one. With hedging enabled, an attempt with no
+    first token by the GEMINI_HEDGE_PERCENTILE of recent ones gets a duplicate request,
+    within GEMINI_HEDGE_BUDGET and the rate limits, and whichever answers first is used.
+    """
+    tokens = estimate_prompt_tokens(prompt)
 
-async def gemini_generate(prompt: str, model: str, api_key: str = my_api_key, temperature: float = TEMPERATURE, session: Optional[aiohttp.ClientSession] = None) -> str:
-    genai.configure(api_key=api_key)
-    gemini_model = genai.GenerativeModel(
-        model_name=model,
-        generation_config=genai.types.GenerationConfig(
-            temperature=temperature,
-            # max_output_tokens=MAX_TOKENS,  # Optional, adjust if needed
+    def acquire_hedge() -> bool:
+        if not hedge_policy.try_acquire(tokens, lambda: gemini_scheduler.try_reserve(api_key, model, tokens)):
+            return False
+        registry.inc("hedges_total", model=model, event="fired")
+        return True
+
+    def on_hedge_won():
+        hedge_policy.record_win()
+        registry.inc("hedges_total", model=model, event="won")
+
+    async def stream(parts: list, usage: dict, deadline: asyncio.Timeout, began: list):
+        # TTFT, the hedge delay and the per-call deadline count from when a thread picks the call up, not
+        # from when it was queued: under load, queueing time would otherwise fire hedges into the same queue.
+        # The total deadline already set on `deadline` still bounds the two together.
+        started = asyncio.Event()
+
+        def on_start():
+            if started.is_set():
+                return
+            began.append(time.perf_counter())
+            if GEMINI_CALL_TIMEOUT:
+                call_deadline = asyncio.get_running_loop().time() + GEMINI_CALL_TIMEOUT
+                deadline.reschedule(min(call_deadline, deadline.when()) if deadline.when() is not None else call_deadline)
+            started.set()
+
+        hedge_delay = hedge_policy.delay(model)
+        async for text in hedged_stream(lambda: gemini_stream(prompt, model, api_key, temperature, cached_content, usage, on_start),
+                                        hedge_delay, acquire_hedge, on_hedge_won, started=started):
+            if not parts:
+                ttft = time.perf_counter() - began[0]
+                record_span("ttft", ttft, model)
+                hedge_policy.observe_ttft(model, ttft)
+            parts.append(text)
+            if on_chunk:
+                on_chunk(text)
+
+    async def attempt() -> str:
+        parts, began = [], []
+        usage = {}
+        started = time.perf_counter()
+        hedge_policy.record_call()
+        total_deadline = asyncio.get_running_loop().time() + GEMINI_CALL_TOTAL_TIMEOUT if GEMINI_CALL_TOTAL_TIMEOUT else None
+        try:
+            async with asyncio.timeout_at(total_deadline) as deadline:
+                await stream(parts, usage, deadline, began)
+        except TimeoutError:
+            if not began:
+                message = f"still waiting for a generation thread after {GEMINI_CALL_TOTAL_TIMEOUT:g}s"
+            else:
+                message = f"no complete response within {GEMINI_CALL_TIMEOUT:g}s ({GEMINI_CALL_TOTAL_TIMEOUT:g}s including queueing)"
+            raise GeminiAPIError(f"Gemini API error: {message}", retryable=not parts) from None
+        except GeminiAPIError as e:
+            if parts:
+                e.retryable = False  # the caller has already seen part of this answer
+            raise
+        result = "".join(parts).strip()
+        elapsed = time.perf_counter() - started
+        record_span("generation", elapsed, model)
+        # Fall back to estimates when the API (or a fake) reports no usage
+        input_tokens = usage.get("input") or tokens
+        record_tokens(model, input_tokens, usage.get("output") or estimate_tokens(result))
+        model_router.observe(model, input_tokens, elapsed)
+        return result
+
+    return await gemini_scheduler.run(api_key, model, tokens, attempt)
+
+async def generate_chunked(video_transcript: str, model_name: str, platform: str, api_key: str, user_query: Optional[str] = None,
+                           chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS, parallelism: int = CHUNK_PARALLELISM,
+                           on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    """Map-reduce generation: extract from token-budgeted windows concurrently, then merge with the format's own prompt.
+
+    Only the reduce pass is streamed to on_chunk. Each window's extract is cached by its
+    prompt, so a retry after one window fails only redoes the ones that didn't finish, and
+    a failed window cancels the others rather than spending quota on a discarded result.
+    """
+    chunks = chunk_transcript(video_transcript, chunk_tokens, overlap_tokens)
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def map_chunk(part: int, chunk: str) -> str:
+        async with semaphore:
+            prompt = build_chunk_map_prompt(chunk, platform, part, len(chunks), user_query)
+            key = cache_key("chunk-extract", model_name, TEMPERATURE, prompt)
+            extract = await asyncio.to_thread(generation_cache.get, key)
+            if extract is None:
+                extract = await gemini_generate(prompt=prompt, model=model_name, api_key=api_key)
+                if extract.strip():
+                    await asyncio.to_thread(generation_cache.set, key, extract)
+            return extract
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(map_chunk(i, chunk)) for i, chunk in enumerate(chunks, start=1)]
+    except ExceptionGroup as failed:
+        raise failed.exceptions[0]
+    extracts = [task.result() for task in tasks]
+    if len(extracts) == 1:
+        condensed = extracts[0]
+    else:
+        condensed = merge_chunk_extracts(extracts)
+    return await gemini_generate(prompt=preview_prompt(condensed, platform, user_query), model=model_name, api_key=api_key, on_chunk=on_chunk)
+
+def use_chunked_generation(video_transcript: str) -> bool:
+    return 0 < CHUNKED_GENERATION_THRESHOLD < estimate_tokens(video_transcript)
+
+def _generation_cache_key(video_transcript: str, model_name: str, platform: str, user_query: Optional[str]) -> str:
+    if use_chunked_generation(video_transcript):
+        return cache_key("generation-chunked", model_name, TEMPERATURE, PROMPT_VERSION, platform, user_query,
+                         CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, video_transcript)
+    return cache_key("generation", model_name, TEMPERATURE, preview_prompt(video_transcript, platform, user_query))
+
+def _cached_generations(video_transcript: str, models: dict, platforms: list[str], user_query: Optional[str]) -> dict:
+    """Blocking: {platform: text} for the formats already in generation_cache."""
+    results = {}
+    for platform in platforms:
+        cached = generation_cache.get(_generation_cache_key(video_transcript, models[platform], platform, user_query))
+        if cached is not None:
+            results[platform] = cached
+    return results
+
+def _store_generations(video_transcript: str, models: dict, outputs: dict, user_query: Optional[str]):
+    """Blocking: cache each {platform: text} output under the key generate_social_media_post looks up."""
+    for platform, text in outputs.items():
+        generation_cache.set(_generation_cache_key(video_transcript, models[platform], platform, user_query), text)
+
+async def generate_social_media_post(video_transcript: str, model_name: str, social_media_platform: str, api_key: str, user_query: Optional[str] = None, use_cache: bool = True,
+                                     on_chunk: Optional[Callable[[Optional[str]], None]] = None) -> str:
+    """Generate one format, streaming text to on_chunk as it arrives.
+
+    on_chunk(None) means the generation restarted and the text sent so far should be
+    discarded. With use_cache=False a fresh sample is drawn and replaces the cached one.
+    """
+    if not video_transcript or not video_transcript.strip():
+        raise ValueError("Missing or empty video transcript")
+
+    chunked = use_chunked_generation(video_transcript)
+    # Hashing a long prompt and reading SQLite both block, so neither runs on the event loop
+    key = await asyncio.to_thread(_generation_cache_key, video_transcript, model_name, social_media_platform, user_query)
+    if use_cache:
+        cached = await asyncio.to_thread(generation_cache.get, key)
+        if cached is not None:
+            if on_chunk:
+                on_chunk(cached)
+            return cached
+
+    async def generate(publish: Callable[[str], None]) -> str:
+        with format_label(social_media_platform):
+            if chunked:
+                result_text = await generate_chunked(video_transcript, model_name, social_media_platform, api_key, user_query, on_chunk=publish)
+            else:
+                with span("prompt_build", model_name):
+                    prompt = preview_prompt(video_transcript, social_media_platform, user_query)
+                result_text = await gemini_generate(prompt=prompt, model=model_name, api_key=api_key, on_chunk=publish)
+        result_text = result_text.strip()
+        if result_text:
+            await asyncio.to_thread(generation_cache.set, key, result_text)
+        return result_text
+
+    # Callers joining an identical in-flight generation get its stream replayed, then the rest live
+    return await generation_flights.do_async(key, generate, on_chunk, on_restart=(lambda: on_chunk(None)) if on_chunk else None)
+
+def _is_client_error(e: Exception) -> bool:
+    """A 4xx other than quota: the request itself isn't allowed, so retrying it soon won't help."""
+    from google.api_core import exceptions as google_exceptions
+    return isinstance(e, google_exceptions.ClientError) and not isinstance(e, google_exceptions.TooManyRequests)
+
+# (hashed API key, model) -> when to try a context cache again, for keys the API refused one (e.g. the free tier)
+_context_cache_refused = {}
+_context_cache_refused_lock = threading.Lock()
+
+def _context_cache_allowed(api_key: str, model: str) -> bool:
+    with _context_cache_refused_lock:
+        retry_at = _context_cache_refused.get((cache_key(api_key), model))
+    return retry_at is None or time.monotonic() >= retry_at
+
+def _refuse_context_cache(api_key: str, model: str):
+    with _context_cache_refused_lock:
+        _context_cache_refused[(cache_key(api_key), model)] = time.monotonic() + CONTEXT_CACHE_REFUSED_TTL
+
+def _transcript_dominates(video_transcript: str, platforms: list[str], user_query: Optional[str]) -> bool:
+    """Whether the transcript is at least COMBINED_MIN_TRANSCRIPT_SHARE of every format's own prompt."""
+    transcript_tokens = estimate_tokens(video_transcript)
+    instruction_tokens = max(estimate_tokens(build_format_instructions(platform, user_query)) for platform in platforms)
+    return transcript_tokens >= COMBINED_MIN_TRANSCRIPT_SHARE * (transcript_tokens + instruction_tokens)
+
+def _create_context_cache(video_transcript: str, model: str, api_key: str):
+    """Blocking: upload the shared transcript block once as a Gemini cached content."""
+    import google.generativeai as genai
+    with _configure_lock:
+        configure_gemini(api_key)
+        return genai.caching.CachedContent.create(
+            model=model,
+            contents=list(build_transcript_context(video_transcript).parts),
+            ttl=datetime.timedelta(minutes=CONTEXT_CACHE_TTL_MINUTES),
         )
+
+def _delete_context_cache(cached_content, api_key: str):
+    with _configure_lock:
+        configure_gemini(api_key)
+        cached_content.delete()
+
+async def _generate_shared_context(video_transcript: str, model_name: str, platforms: list[str], api_key: str,
+                                   user_query: Optional[str] = None, mode: str = SHARED_CONTEXT_MODE,
+                                   on_token: Optional[Callable[[str, Optional[str]], None]] = None) -> dict:
+    """Generate several formats while sending the transcript once.
+
+    Returns only the formats it produced; callers generate anything missing independently.
+    """
+    loop = asyncio.get_running_loop()
+    if (mode in ("auto", "cache") and estimate_tokens(video_transcript) >= CONTEXT_CACHE_MIN_TOKENS
+            and _context_cache_allowed(api_key, model_name)):
+        try:
+            cached_content = await loop.run_in_executor(_generation_executor, _create_context_cache, video_transcript, model_name, api_key)
+        except Exception as e:
+            if _is_client_error(e):
+                # Not available to this key or model: don't pay the failed upload on every request
+                _refuse_context_cache(api_key, model_name)
+            print(f"[Context cache] Could not cache transcript, falling back: {e}")
+        else:
+            try:
+                outputs = await asyncio.gather(*(
+                    _generate_labelled(platform, build_format_instructions(platform, user_query), model_name, api_key,
+                                       cached_content=cached_content, on_chunk=_bind_platform(on_token, platform))
+                    for platform in platforms
+                ), return_exceptions=True)
+            finally:
+                try:
+                    await loop.run_in_executor(_generation_executor, _delete_context_cache, cached_content, api_key)
+                except Exception as e:
+                    print(f"[Context cache] Could not delete {cached_content.name}: {e}")
+            return {platform: output for platform, output in zip(platforms, outputs) if isinstance(output, str) and output}
+
+    if mode == "combined" or (mode == "auto" and _transcript_dominates(video_transcript, platforms, user_query)):
+        demux = MultiFormatDemux(platforms)
+
+        def route(text: str):
+            for platform, piece in demux.feed(text):
+                on_token(platform, piece)
+
+        with span("prompt_build", model_name, "combined"):
+            prompt = build_multi_format_prompt(video_transcript, platforms, user_query)
+        try:
+            combined = await _generate_labelled("combined", prompt, model_name, api_key, on_chunk=route if on_token else None)
+            if on_token:
+                for platform, piece in demux.flush():
+                    on_token(platform, piece)
+        except Exception as e:
+            print(f"[Combined request] Failed, falling back to one request per format: {e}")
+            return {}
+        return split_multi_format_output(combined, platforms)
+    return {}
+
+async def _generate_labelled(platform: str, prompt: str, model: str, api_key: str, **kwargs) -> str:
+    """gemini_generate with its spans and token counts attributed to one format."""
+    with format_label(platform):
+        return await gemini_generate(prompt, model, api_key, **kwargs)
+
+def _bind_platform(on_token: Optional[Callable[[str, Optional[str]], None]], platform: str) -> Optional[Callable[[str], None]]:
+    if on_token is None:
+        return None
+    return lambda text: on_token(platform, text)
+
+def resolve_models(video_transcript: str, platforms: list[str], model_name: Union[str, dict]) -> dict:
+    """{platform: model}: model_name may be one model for all, a per-format dict, or "auto" to route."""
+    if isinstance(model_name, dict):
+        return {platform: model_name[platform] for platform in platforms}
+    if model_name == AUTO_MODEL:
+        # Route on the size of the prompt each format would send, which is what latencies are observed against
+        prepared = prepare_transcript(video_transcript)
+        return {platform: model_router.route(platform, preview_prompt(prepared, platform).estimated_tokens)
+                for platform in platforms}
+    return {platform: model_name for platform in platforms}
+
+async def _generate_shared_group(video_transcript: str, model_name: str, platforms: list[str], api_key: str,
+                                 user_query: Optional[str], on_token: Optional[Callable[[str, Optional[str]], None]]) -> dict:
+    flight_key = cache_key("shared-context", model_name, TEMPERATURE, user_query, *platforms, video_transcript)
+    shared = await generation_flights.do_async(
+        flight_key,
+        lambda publish: _generate_shared_context(video_transcript, model_name, platforms, api_key, user_query, on_token=publish),
+        on_token,
+        on_restart=(lambda: [on_token(platform, None) for platform in platforms]) if on_token else None,
     )
-    full_text = ""
-    try:
-        response = gemini_model.generate_content(prompt, stream=True)
-        for chunk in response:
-            if chunk.text:
-                full_text += chunk.text
-    except Exception as e:
-        raise RuntimeError(f"Gemini API error: {str(e)}")
+    return {platform: text.strip() for platform, text in shared.items()}
 
-    return full_text.strip()
+async def generate_formats(video_transcript: str, model_name: Union[str, dict], platforms: list[str], api_key: str,
+                           user_query: Optional[str] = None, use_cache: bool = True,
+                           on_token: Optional[Callable[[str, Optional[str]], None]] = None) -> dict:
+    """Generate every requested format, uploading the transcript once per model where the backend allows.
 
-async def generate_social_media_post(video_transcript: str, model_name: str, social_media_platform: str, api_key: str, user_query: Optional[str] = None) -> str:
+    model_name is a model, a {platform: model} dict, or "auto" to let model_router pick per format.
+
+    on_token(platform, text) receives output as it streams in, with formats interleaved.
+    on_token(platform, None) means a format is being regenerated from scratch and any
+    text shown for it so far should be discarded.
+
+    Returns {platform: text or Exception}, like asyncio.gather(..., return_exceptions=True).
+    """
     if not video_transcript or not video_transcript.strip():
         raise ValueError("Missing or empty video transcript")
-    if social_media_platform.lower() == "tutorial blog":
-        prompt = build_tutorial_prompt(video_transcript, social_media_platform, user_query)
-    elif social_media_platform.lower() == "summary":
-        prompt = build_merged_summary_prompt(video_transcript, social_media_platform, user_query)
-    elif social_media_platform.lower() == "note taking":
-        prompt = build_note_taking_prompt(video_transcript, social_media_platform, user_query)
-    else:
-        prompt = build_social_media_prompt(video_transcript, social_media_platform, user_query)
 
-    async with aiohttp.ClientSession() as session:
-        result_text = await gemini_generate(prompt=prompt, model=model_name, api_key=api_key, session=session)
-    return result_text.strip()
+    # Routing takes the original transcript, like every other caller, and compresses it the same way (memoized).
+    # Compression, prompt hashing and cache reads are CPU or SQLite work, so they run off the event loop.
+    models = await asyncio.to_thread(resolve_models, video_transcript, platforms, model_name)
+    if TRANSCRIPT_COMPRESSION:
+        # Deterministic, so a compressed transcript gives the same prompts and cache keys every time
+        with span("transcript_compress"):
+            compressed = await asyncio.to_thread(_compressed, video_transcript)
+        record_compression(compressed.input_tokens, compressed.output_tokens, compressed.dropped_lines)
+        video_transcript = compressed.text or video_transcript
+    results = await asyncio.to_thread(_cached_generations, video_transcript, models, platforms, user_query) if use_cache else {}
+    pending = [platform for platform in platforms if platform not in results]
+    if on_token:
+        for platform, cached in results.items():
+            on_token(platform, cached)
+
+    if SHARED_CONTEXT_MODE != "off" and not use_chunked_generation(video_transcript):
+        groups = {}
+        for platform in pending:
+            groups.setdefault(models[platform], []).append(platform)
+        groups = {model: group for model, group in groups.items() if len(group) > 1}
+        if groups:
+            shared_outputs = await asyncio.gather(*(
+                _generate_shared_group(video_transcript, model, group, api_key, user_query, on_token)
+                for model, group in groups.items()
+            ))
+            for shared in shared_outputs:
+                results.update(shared)
+                await asyncio.to_thread(_store_generations, video_transcript, models, shared, user_query)
+            retry = [platform for group in groups.values() for platform in group if platform not in results]
+            if on_token:
+                for platform in retry:
+                    on_token(platform, None)
+            pending = [platform for platform in pending if platform not in results]
+
+    outputs = await asyncio.gather(*(
+        generate_social_media_post(video_transcript, models[platform], platform, api_key, user_query, use_cache=False,
+                                   on_chunk=_bind_platform(on_token, platform))
+        for platform in pending
+    ), return_exceptions=True)
+    results.update(zip(pending, outputs))
+    return {platform: results[platform] for platform in platforms}
 
-async def generate_posts_for_all_platforms(video_transcript: str, model_name: str, platforms: list[str], api_key: str) -> dict:
-    tasks = [
-        generate_social_media_post(video_transcript, model_name, platform, api_key)
-        for platform in platforms if platform in VALID_PLATFORMS
-    ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+async def generate_posts_for_all_platforms(video_transcript: str, model_name: Union[str, dict], platforms: list[str], api_key: str, use_cache: bool = True) -> dict:
+    platforms = [platform for platform in platforms if platform in VALID_PLATFORMS]
+    results = await generate_formats(video_transcript, model_name, platforms, api_key, use_cache=use_cache)
 
     output = {}
-    for platform, result in zip(platforms, results):
+    for platform, result in results.items():
         if isinstance(result, Exception):
             output[platform] = f"[Error generating content: {result}]"
         else: